@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+# coding=utf-8
+import collections
+import hashlib
+import json
+import os
+import threading
+import wave
+import pygame
+
+import datacache
+import sfx
+from sfx import voices
+
+SOUND_DIR = 'decompilation/sound/'
+AUDIO_DIR = 'decompilation/audio/'
+MUSIC_DIR = 'mus/'
+VERSION = 2  # bump when build changes, to throw away cached tables
+
+AudioAsset = collections.namedtuple('AudioAsset', ['name', 'kind', 'path', 'volume', 'pitch', 'group', 'sfx_id'])
+
+
+def _pcm_digest(path: str) -> bytes:
+    try:
+        w = wave.open(path)
+        try:
+            return hashlib.sha1(w.readframes(w.getnframes())).digest()
+        finally:
+            w.close()
+    except (OSError, EOFError, wave.Error):
+        return None
+
+
+def _digests(directory: str) -> ({str: bytes}, {str: str}):
+    """
+    Digest the audio of every WAV in a directory, taking the digests of transcoded files from its manifest.
+    :return: 2-tuple of original file name -> digest, and original file name -> path of the file to load.
+    """
+    manifest = sfx.read_manifest(directory)
+    try:
+        names = set(os.listdir(directory))
+    except OSError:
+        names = set()
+    digests = {}
+    paths = {}
+    for name in names | set(manifest):
+        entry = manifest.get(name, None)
+        if entry is not None and entry['file'] in names:
+            paths[name] = os.path.join(directory, entry['file'])
+            digests[name] = bytes.fromhex(entry['pcm']) if entry.get('pcm', None) else None
+        elif name in names and name.endswith('.wav'):
+            paths[name] = os.path.join(directory, name)
+            digests[name] = _pcm_digest(paths[name])
+    return digests, paths
+
+
+def build() -> [AudioAsset]:
+    """
+    Read every decompiled sound definition into one table. The sfx directory names its files by id
+    rather than by name, so embedded sounds are matched to sfx ids by comparing their decoded audio.
+    Music files that have no definition are added with default settings.
+    """
+    by_digest = {}
+    sfx_digests = _digests(sfx.SFX_DIR)[0]
+    for sound_id, name in sorted((int(i.split('.')[0], 16), i) for i in sfx_digests):
+        if sfx_digests[name] is not None:
+            by_digest.setdefault(sfx_digests[name], []).append(sound_id)
+    audio_digests, audio_paths = _digests(AUDIO_DIR)
+    unclaimed = {k: list(v) for k, v in by_digest.items()}
+
+    assets = []
+    for i in sorted(os.listdir(SOUND_DIR)):
+        if not i.endswith('.json'):
+            continue
+        with open(SOUND_DIR + i) as f:
+            data = json.load(f)
+        path = None
+        sfx_id = None
+        extracted = os.path.splitext(data['file'])[0] + '.wav'  # embedded audio was extracted as WAV whatever its type
+        if data['embedded'] and extracted in audio_paths:
+            path = audio_paths[extracted]
+            digest = audio_digests[extracted]
+            if unclaimed.get(digest, None):
+                sfx_id = unclaimed[digest].pop(0)
+            elif digest in by_digest:
+                sfx_id = by_digest[digest][0]  # more names than files with this audio, so they share one
+        elif os.path.exists(MUSIC_DIR + data['file']):
+            path = MUSIC_DIR + data['file']
+        assets.append(AudioAsset(i[:-len('.json')], 'sound' if data['type'] == '.wav' else 'music', path,
+                                 data['volume'], data['pitch'], data['groupid'], sfx_id))
+    known = set(i.name for i in assets)
+    for i in sorted(os.listdir(MUSIC_DIR)):
+        name = os.path.splitext(i)[0]
+        if name not in known:
+            assets.append(AudioAsset(name, 'music', MUSIC_DIR + i, 1.0, 0.0, 0, None))
+    return assets
+
+
+class Registry:
+    """
+    Every sound and music asset, by its GameMaker name. The table is built once from the decompiled data,
+    cached, and held in memory; lookups after that never touch the filesystem.
+    """
+
+    def __init__(self):
+        self.by_name = None
+        self.by_sfx_id = None
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        with self.lock:
+            if self.by_name is None:
+                assets = datacache.load('audio', [SOUND_DIR, AUDIO_DIR, MUSIC_DIR, sfx.SFX_DIR], build, VERSION)
+                self.by_sfx_id = {i.sfx_id: i for i in assets if i.sfx_id is not None}
+                self.by_name = {i.name: i for i in assets}
+
+    def get(self, name: str) -> AudioAsset:
+        if self.by_name is None:
+            self.load()
+        return self.by_name[name]
+
+    def sound_id(self, sound) -> int:
+        """
+        Return the sfx id for a sound given by name, or the id itself if given one.
+        """
+        if isinstance(sound, int):
+            return sound
+        sound_id = self.get(sound).sfx_id
+        if sound_id is None:
+            raise KeyError('{} has no sound file'.format(sound))
+        return sound_id
+
+    def for_room(self, room) -> [AudioAsset]:
+        """
+        List the assets a room needs: its song and its sounds, which may be given by name or by sfx id.
+        """
+        if self.by_name is None:
+            self.load()
+        out = []
+        if room.song is not None:
+            out.append(self.by_name[room.song])
+        for i in room.sounds:
+            out.append(self.by_sfx_id[i] if isinstance(i, int) else self.by_name[i])
+        return out
+
+
+registry = Registry()
+
+
+def get(name: str) -> AudioAsset:
+    return registry.get(name)
+
+
+def get_sound(name: str) -> pygame.mixer.Sound:
+    """
+    Return the Sound for a sound asset, with its volume set the way the game data says.
+    """
+    asset = registry.get(name)
+    s = sfx.get_sound(registry.sound_id(name))
+    s.set_volume(asset.volume)
+    return s
+
+
+def play(name: str, priority: int = voices.PRIORITY_EFFECT, loops: int = 0) -> pygame.mixer.Channel:
+    """
+    Play a sound asset through the voice manager. Return its Channel, or None if the voice was dropped.
+    """
+    return voices.manager.play(name, get_sound(name), priority, loops)
+
+
+def music_path(name: str) -> str:
+    return registry.get(name).path
+
+
+def sound_ids(sounds: list) -> [int]:
+    return [registry.sound_id(i) for i in sounds]
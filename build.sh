@@ -26,6 +26,12 @@ fi
 # Create build directory
 mkdir -p build/web
 
+echo "🎵 Transcoding audio..."
+# Writes OGG files and manifests next to the WAVs; the WAVs are kept so later runs can rebuild.
+# Pass --prune in throwaway checkouts (CI) to leave them out of the build.
+python3 transcode_audio.py
+echo ""
+
 echo "🔨 Building with pygbag..."
 echo "This may take a few minutes..."
 echo ""
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# coding=utf-8
+import collections
+import json
+
+import pygame
+import data_types
+import spatial
+import sprite
+
+SPRITE_DIR = 'decompilation/sprite/'
+SOLID_PARENTS = {'obj_solidparent', 'obj_solidnpcparent'}  # every object Frisk can't walk through descends from these
+
+Shape = collections.namedtuple('Shape', ['points', 'bbox', 'size', 'origin'])  # points is None for a plain bbox
+
+
+def decode(colmask: dict) -> [(int, int)]:
+    """
+    :return: the set pixels of an exported collision mask.
+    """
+    return [(x, y) for y, row in enumerate(colmask['data']) for x, v in enumerate(row) if v]
+
+
+def texture_alpha(data: dict) -> pygame.mask.Mask:
+    """
+    The opaque pixels of a sprite's first frame, which is what GameMaker makes a precise mask of.
+    """
+    with open('decompilation/texpage/{}.json'.format(data['textures'][0])) as f:
+        texdata = json.load(f)
+    src, dest = texdata['src'], texdata['dest']
+    sheet = sprite.texsheets[texdata['sheetid']]
+    opaque = pygame.mask.from_surface(sheet.subsurface(pygame.Rect(src['x'], src['y'], src['width'], src['height'])), 0)
+    mask = pygame.mask.Mask((data['size']['width'], data['size']['height']))
+    mask.draw(opaque, (dest['x'], dest['y']))
+    return mask
+
+
+def read_shape(name: str) -> Shape:
+    """
+    A sprite's collision mask is used only if it agrees with the opaque pixels of the sprite inside its box,
+    which is how GameMaker makes precise masks. The export garbles most of them (see parse_sprites.save), and
+    the wall sprites are hollow editor markers whose pixels are no better; everything else collides by its
+    bounding box.
+    """
+    with open(SPRITE_DIR + name + '.json') as f:
+        data = json.load(f)
+    b = data['bounding']
+    size = (data['size']['width'], data['size']['height'])
+    # a few manual boxes reach past the image; masks are the image's size, so they end at its edge
+    bbox = pygame.Rect(b['left'], b['top'], b['right'] - b['left'] + 1, b['bottom'] - b['top'] + 1).clip(
+        pygame.Rect((0, 0), size))
+    points = None
+    if data.get('colmasks', None) and data['textures']:  # collision masks are optional; see spr_alphys_gameboy.
+        alpha = texture_alpha(data)
+        precise = [(x, y) for y in range(bbox.top, bbox.bottom) for x in range(bbox.left, bbox.right)
+                   if alpha.get_at((x, y))]
+        points = decode(data['colmasks'][0])
+        if sorted(points, key=lambda i: (i[1], i[0])) != precise:
+            points = None
+    return Shape(points, bbox, size, (data['origin']['x'], data['origin']['y']))
+
+
+class ShapeDict(data_types.DynamicLoadDict):
+    def fetch(self, name):
+        return read_shape(name)
+
+
+shapes = ShapeDict()
+
+
+class MaskDict(data_types.DynamicLoadDict):
+    """
+    Masks by (sprite name, x scale, y scale), made once from the shape; a negative scale mirrors.
+    """
+
+    def fetch(self, key):
+        name, scalex, scaley = key
+        shape = shapes[name]
+        w, h = shape.size
+        mask = pygame.mask.Mask((w, h))
+        if shape.points is None:
+            box = shape.bbox
+            points = [(x, y) for x in range(box.left, box.right) for y in range(box.top, box.bottom)]
+        else:
+            points = shape.points
+        for x, y in points:
+            mask.set_at((w - 1 - x if scalex < 0 else x, h - 1 - y if scaley < 0 else y), 1)
+        size = (max(int(w * abs(scalex)), 1), max(int(h * abs(scaley)), 1))
+        return mask.scale(size) if size != (w, h) else mask
+
+
+masks = MaskDict()
+
+
+class Collider:
+    """
+    Something that can be collided with: a mask placed in the room, and the box around its set pixels.
+    """
+    __slots__ = ('rect', 'topleft', 'mask', 'data', 'space')
+
+    def __init__(self, rect: pygame.Rect, topleft: (int, int), mask: pygame.mask.Mask, data=None):
+        self.rect = rect
+        self.topleft = topleft
+        self.mask = mask
+        self.data = data
+        self.space = None
+
+    def bounds(self) -> pygame.Rect:
+        return self.rect
+
+    def moved(self, dx: int, dy: int):
+        return Collider(self.rect.move(dx, dy), (self.topleft[0] + dx, self.topleft[1] + dy), self.mask, self.data)
+
+    def overlaps(self, other) -> bool:
+        if not self.rect.colliderect(other.rect):
+            return False
+        offset = (other.topleft[0] - self.topleft[0], other.topleft[1] - self.topleft[1])
+        return self.mask.overlap(other.mask, offset) is not None
+
+
+def place(name: str, pos: (float, float), scalex: float = 1, scaley: float = 1, data=None) -> Collider:
+    """
+    A collider for sprite name drawn with its origin at pos, scaled.
+    """
+    shape = shapes[name]
+    mask = masks[(name, scalex, scaley)]
+    w, h = shape.size
+    ox = shape.origin[0] * scalex if scalex > 0 else (w - shape.origin[0]) * -scalex
+    oy = shape.origin[1] * scaley if scaley > 0 else (h - shape.origin[1]) * -scaley
+    left, top = int(pos[0] - ox), int(pos[1] - oy)
+    box = shape.bbox
+    bx = box.left if scalex > 0 else w - box.right
+    by = box.top if scaley > 0 else h - box.bottom
+    rect = pygame.Rect(left + int(bx * abs(scalex)), top + int(by * abs(scaley)),
+                       max(int(box.width * abs(scalex)), 1), max(int(box.height * abs(scaley)), 1))
+    return Collider(rect, (left, top), mask, data)
+
+
+def is_solid(instance) -> bool:
+    """
+    Whether a room instance (a rooms.loader.Instance) blocks Frisk.
+    """
+    return instance.obj in SOLID_PARENTS or any(i in SOLID_PARENTS for i in instance.parents)
+
+
+class Solids(spatial.SpatialHash):
+    """
+    The colliders of a room. Boxes found through the grid are the broad phase, masks the narrow one,
+    so a check costs as much as the colliders near it.
+    """
+
+    def hits(self, collider: Collider) -> [Collider]:
+        return [i for i in self.query_rect(collider.rect) if collider.overlaps(i)]
+
+    def blocked(self, collider: Collider) -> bool:
+        return any(collider.overlaps(i) for i in self.query_rect(collider.rect))
+
+    def move(self, collider: Collider, dx: int, dy: int) -> (int, int):
+        """
+        How far collider can go of (dx, dy): all the way, or along one axis to slide along a wall, or not at all.
+        """
+        if not self:
+            return dx, dy
+        for x, y in [(dx, dy), (dx, 0), (0, dy)]:
+            if (x or y) and not self.blocked(collider.moved(x, y)):
+                return x, y
+        return 0, 0
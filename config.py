@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+# coding=utf-8
+import atexit
+import configparser
+import io
+import os
+import threading
+import time
+
+import data_types
+import savedata
+
+FLUSH_DELAY = 1.0  # seconds a change waits for more changes before the file is written
+CHECK_INTERVAL = 1.0  # seconds between checks whether someone else changed the file
+
+
+def _signature(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Config:
+    """
+    An INI file held in memory. It is read on first use; after that reads are dictionary lookups.
+    Writes change the memory copy at once and reach the disk in one batch, FLUSH_DELAY seconds after the
+    first of them, through the atomic background writer. If the file is changed by someone else, it is
+    read again and the changes not yet written are applied on top.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sections = None  # section -> {option: value}, or None if there is no file yet
+        self.pending = {}  # (section, option) -> value not written yet
+        self.signature = None
+        self.writing = 0  # writes handed to the writer and not done yet
+        self.checked_at = 0.0
+        self.timer = None
+        self.lock = threading.RLock()
+
+    def read(self) -> None:
+        c = configparser.ConfigParser()
+        signature = _signature(self.path)
+        try:
+            with open(self.path) as o:
+                c.read_string(o.read())
+        except FileNotFoundError:
+            self.sections = None
+        else:
+            self.sections = {i: dict(c[i]) for i in c.sections()}
+        self.signature = signature
+        for (section, option), value in self.pending.items():
+            self.sections = {} if self.sections is None else self.sections
+            self.sections.setdefault(section, {})[option] = value
+        self.checked_at = time.time()
+
+    def check(self) -> None:
+        """
+        Read the file the first time, or again if it changed on disk since it was last read or written.
+        """
+        if self.signature is None and self.sections is None and self.checked_at == 0.0:
+            self.read()
+        elif time.time() - self.checked_at >= CHECK_INTERVAL:
+            self.checked_at = time.time()
+            if _signature(self.path) != self.signature and not self.pending and not self.writing:
+                self.read()
+
+    def get(self, section: str, option: str, kind=None):
+        """
+        Return a value, converted the way Frisk.get_ini_value describes; None if it or the file is missing.
+        """
+        with self.lock:
+            self.check()
+            if self.sections is None:
+                return None
+            value = self.sections.get(section, {}).get(option.lower(), None)
+        if value is None:
+            return None
+        if isinstance(kind, int):
+            return int(value)
+        elif isinstance(kind, float):
+            return float(value)
+        elif isinstance(kind, bool):
+            try:
+                return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+            except KeyError:
+                raise ValueError('Not a boolean: {}'.format(value))
+        else:
+            return value
+
+    def set(self, section: str, option: str, value) -> None:
+        with self.lock:
+            self.check()
+            option = option.lower()
+            value = str(value)
+            self.sections = {} if self.sections is None else self.sections
+            self.sections.setdefault(section, {})[option] = value
+            self.pending[(section, option)] = value
+            if self.timer is None:
+                self.timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self, wait: bool = False) -> None:
+        """
+        Hand every pending change to the writer. Call at safe points (saving, quitting) to not wait for the timer.
+        If wait is set, return only once the file is on disk.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.pending:
+                if _signature(self.path) != self.signature and not self.writing:
+                    self.read()  # merge with whatever someone else wrote meanwhile
+                c = configparser.ConfigParser()
+                c.read_dict(self.sections)
+                out = io.StringIO()
+                c.write(out)
+                written = self.pending
+                self.pending = {}
+                self.writing += 1
+                savedata.writer.write(self.path, out.getvalue(), lambda error: self.written(written, error))
+        if wait:
+            savedata.writer.flush()
+
+    def written(self, values: dict, error) -> None:
+        """
+        Called by the writer once a flush is on disk, or failed to get there. Until then the file on disk is
+        older than the memory copy, so check doesn't read it back.
+        """
+        with self.lock:
+            self.writing -= 1
+            if error is not None:  # not written after all: keep the values pending for the next flush
+                for key, value in values.items():
+                    self.pending.setdefault(key, value)
+            elif not self.writing:
+                self.signature = _signature(self.path)
+
+
+class ConfigDict(data_types.DynamicLoadDict):
+    def fetch(self, name):
+        return Config(name)
+
+
+configs = ConfigDict()
+
+
+def get_config(path: str) -> Config:
+    return configs[path]
+
+
+def flush_all(wait: bool = False) -> None:
+    for i in list(configs.values()):
+        i.flush(wait)
+
+
+atexit.register(flush_all, True)
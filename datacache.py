@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+# coding=utf-8
+import os
+import pickle
+
+CACHE_DIR = './cache/'
+
+
+def signature(sources: [str]) -> tuple:
+    """
+    Describe the current state of the source files and directories: their modification times and sizes
+    (for a directory, how many entries it has). Adding, removing or replacing a file changes it.
+    """
+    out = []
+    for i in sources:
+        try:
+            st = os.stat(i)
+        except OSError:
+            out.append((i, None))
+            continue
+        if os.path.isdir(i):
+            out.append((i, st.st_mtime_ns, len(os.listdir(i))))
+        else:
+            out.append((i, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def load(name: str, sources: [str], build: callable, version: int = 1):
+    """
+    Return what build() returns, from the cache file for name if it was built from these exact sources
+    by the same version of build. Otherwise build it and write the cache for next time.
+    Failing to write the cache is not an error.
+    """
+    path = os.path.join(CACHE_DIR, name + '.pickle')
+    sig = (version, signature(sources))
+    try:
+        with open(path, 'rb') as f:
+            cached_sig, data = pickle.load(f)
+        if cached_sig == sig:
+            return data
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass
+    data = build()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump((sig, data), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return data
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+# coding=utf-8
+import array
+import threading
+import weakref
+
+ALIVE = 1
+VISIBLE = 2
+
+
+class Store:
+    """
+    Every object of the game as a row in parallel columns: position, velocity, depth and flags in typed
+    arrays, and the sprite and the owning object in lists. An entity is just its row number; rows of
+    released entities are reused. objects.Object is a thin face over one row.
+    """
+
+    def __init__(self):
+        self.x = array.array('d')
+        self.y = array.array('d')
+        self.vx = array.array('d')
+        self.vy = array.array('d')
+        self.depth = array.array('l')
+        self.flags = array.array('B')
+        self.sprite = []
+        self.owner = []  # weak references to the objects, or None
+        self.free = []
+        self.moving = set()  # entities with a velocity, the only ones step() looks at
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.flags) - len(self.free)
+
+    def new(self, x: float, y: float, depth: int = 0, sprite=None, owner=None) -> int:
+        with self.lock:
+            if self.free:
+                e = self.free.pop()
+                self.x[e], self.y[e], self.vx[e], self.vy[e] = x, y, 0.0, 0.0
+                self.depth[e], self.flags[e] = depth, ALIVE | VISIBLE
+                self.sprite[e] = sprite
+                self.owner[e] = weakref.ref(owner) if owner is not None else None
+                return e
+            self.x.append(x)
+            self.y.append(y)
+            self.vx.append(0.0)
+            self.vy.append(0.0)
+            self.depth.append(depth)
+            self.flags.append(ALIVE | VISIBLE)
+            self.sprite.append(sprite)
+            self.owner.append(weakref.ref(owner) if owner is not None else None)
+            return len(self.flags) - 1
+
+    def release(self, e: int) -> None:
+        with self.lock:
+            if not self.flags[e] & ALIVE:
+                return
+            self.flags[e] = 0
+            self.sprite[e] = None
+            self.owner[e] = None
+            self.moving.discard(e)
+            self.free.append(e)
+
+    def set_velocity(self, e: int, vx: float, vy: float) -> None:
+        self.vx[e], self.vy[e] = vx, vy
+        if vx or vy:
+            self.moving.add(e)
+        else:
+            self.moving.discard(e)
+
+    def alive(self):
+        """
+        :return: the entities in use, in row order.
+        """
+        flags = self.flags
+        return [e for e in range(len(flags)) if flags[e] & ALIVE]
+
+    def step(self) -> None:
+        """
+        Move every entity with a velocity by it, once a frame.
+        """
+        x, y, vx, vy, owner = self.x, self.y, self.vx, self.vy, self.owner
+        for e in list(self.moving):
+            x[e] += vx[e]
+            y[e] += vy[e]
+            o = owner[e]() if owner[e] is not None else None
+            if o is not None and o.space is not None:
+                o.space.update(o)
+
+
+store = Store()
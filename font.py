@@ -1,12 +1,17 @@
 #!/usr/bin/python3
 #  coding=utf-8
+import collections
 import json
+import threading
 import pygame
 
 import data_types
 import sprite
 
 
+Glyph = collections.namedtuple('Glyph', ['frame', 'shift', 'offset'])
+
+
 class Font:
     def __init__(self):
         self.json_name = 'fnt_empty'
@@ -14,30 +19,53 @@ class Font:
         self.bold = False
         self.italic = False
         self.antialias = 'off'
-        self.characters = {}
+        self.atlas = pygame.Surface((0, 0))
+        self.glyphs = {}
 
     def __str__(self):
         return '{} ({})'.format(self.json_name, self.sysname)
 
-    def render(self, text: str, color: pygame.Color = None) -> pygame.Surface:
-        text_surfaces = []
-        for i in text:
-            obj = self.characters.get(i, None)
-            if obj is not None:
-                text_surfaces.append(obj)
+    def size(self, text: str) -> (int, int):
+        """
+        Measure text without rendering it.
+        :return: 2-tuple of the width and height that render would produce for this text.
+        """
         x = 0
         y = 0
-        for i in text_surfaces:
-            x += i[1]
-            y = max(y, i[0].get_height())
-        s = pygame.Surface((x, y))
+        for i in text:
+            glyph = self.glyphs.get(i, None)
+            if glyph is not None:
+                x += glyph.shift
+                y = max(y, glyph.frame.height)
+        return x, y
+
+    def render(self, text: str, color: pygame.Color = None) -> pygame.Surface:
+        """
+        Render text, reusing an earlier surface from the render cache if there is one.
+        The returned surface may be shared, so copy it before drawing on it.
+        """
+        key = (self.json_name, text, None if color is None else tuple(color))
+        s = cache.get(key)
+        if s is None:
+            s = self.render_uncached(text, color)
+            cache.put(key, s)
+        return s
+
+    def render_uncached(self, text: str, color: pygame.Color = None) -> pygame.Surface:
+        """
+        Blit each glyph straight out of the atlas. Glyphs are white on black, so multiplying by
+        the color tints the text in one pass, whatever the color is.
+        """
+        s = pygame.Surface(self.size(text))
         x = 0
-        for i in text_surfaces:
-            s.blit(i[0], (x + i[2], 0))
-            x += i[1]
-        if color is None:
-            return s
-        return sprite.convert_color(s, pygame.Color('white'), color)
+        for i in text:
+            glyph = self.glyphs.get(i, None)
+            if glyph is not None:
+                s.blit(self.atlas, (x + glyph.offset, 0), glyph.frame)
+                x += glyph.shift
+        if color is not None:
+            s.fill(color, special_flags=pygame.BLEND_RGB_MULT)
+        return s
 
     @staticmethod
     def load_from_json(name: str):
@@ -48,17 +76,61 @@ class Font:
         f.bold = data['bold']
         f.italic = data['italic']
         f.antialias = data['antialias']
-        texture = sprite.textures[data['texture']]
+        f.atlas = sprite.textures[data['texture']]  # every glyph of a font lives on this one texture page
         for i in data['chars']:
-            char = i['char']
-            rect = sprite.json_rect_to_real_rect(i['frame'])
-            surface = sprite.cutout(texture, rect)
-            shift = i['shift']
-            offset = i['offset']
-            f.characters.update({char: (surface, shift, offset)})
+            f.glyphs.update({i['char']: Glyph(sprite.json_rect_to_real_rect(i['frame']), i['shift'], i['offset'])})
         return f
 
 
+class RenderCache:
+    """
+    LRU cache of rendered text surfaces, bounded by the number of bytes their pixels take up.
+    """
+
+    def __init__(self, budget: int = 2 * 1024 * 1024):
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def surface_bytes(s: pygame.Surface) -> int:
+        return s.get_width() * s.get_height() * s.get_bytesize()
+
+    def get(self, key) -> pygame.Surface:
+        with self.lock:
+            s = self.entries.get(key, None)
+            if s is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return s
+
+    def put(self, key, s: pygame.Surface) -> None:
+        size = self.surface_bytes(s)
+        if size > self.budget:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.used -= self.surface_bytes(old)
+            self.entries[key] = s
+            self.used += size
+            while self.used > self.budget:
+                self.used -= self.surface_bytes(self.entries.popitem(last=False)[1])
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+
+cache = RenderCache()
+
+
 class FontsDict(data_types.DynamicLoadDict):
     def fetch(self, name):
         return Font.load_from_json(name)
@@ -71,6 +143,10 @@ def render(text: str, font: str = 'fnt_main', color: pygame.Color = None):
     return fonts[font].render(text, color)
 
 
+def size(text: str, font: str = 'fnt_main') -> (int, int):
+    return fonts[font].size(text)
+
+
 if __name__ == '__main__':
     import debug_tools
     import string
@@ -1,30 +1,180 @@
 #!/usr/bin/python3
 # coding=utf-8
-import configparser
+import array
+import os
 import sys
 import traceback
+import config
 import globals
 import item
 import rooms
+import savedata
 import sprite
+from rooms import transition
+
+
+class Journal:
+    """
+    Which fields of a Frisk changed, and when. Every change bumps version; a reader remembers the version it
+    last looked at and asks for what changed since, so any number of readers can follow along.
+    Flags are recorded under their file0 field names, flag0 to flag511.
+    """
+    __slots__ = ('version', 'changes')
+
+    def __init__(self):
+        self.version = 0
+        self.changes = {}  # field -> version it last changed at
+
+    def record(self, field: str) -> None:
+        self.version += 1
+        self.changes[field] = self.version
+
+    def since(self, version: int) -> set:
+        return set(k for k, v in self.changes.items() if v > version)
+
+
+class Flags(array.array):
+    """
+    The 512 SAVEd flags, as C ints. Writes are recorded in a journal.
+    """
+
+    def __new__(cls, journal: Journal, values=(0,) * 512):
+        self = super().__new__(cls, 'i', values)
+        self.journal = journal
+        return self
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            indices = range(*key.indices(len(self)))
+            old = [self[i] for i in indices]
+            super().__setitem__(key, array.array('i', value))
+            for i, j in zip(indices, old):
+                if self[i] != j:
+                    self.journal.record('flag{}'.format(i))
+        elif self[key] != value:
+            super().__setitem__(key, value)
+            self.journal.record('flag{}'.format(key % len(self)))
+
+
+class Tracked:
+    """
+    An attribute whose changes are recorded in the owner's journal. The value lives in the slot
+    named like the attribute with an underscore in front. Setting the value it already has is no change.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = owner.__dict__['_' + name]
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return self.slot.__get__(instance, owner)
+
+    def __set__(self, instance, value):
+        try:
+            if self.slot.__get__(instance, type(instance)) == value:
+                return
+        except AttributeError:  # not set yet
+            pass
+        self.slot.__set__(instance, value)
+        instance.journal.record(self.name)
 
 
 class Frisk:
-    def __setattr__(self, key, value):
-        object.__setattr__(self, key, value)
-        if key == "weapon":
-            self.wstrength = value.strength
-        elif key == "armor":
-            self.adef = value.defense
-        if key == 'pos':
-            object.__setattr__(self, 'x', value[0])
-            object.__setattr__(self, 'y', value[1])
-        elif key == 'x':
-            object.__setattr__(self, 'pos', (value, self.pos[1]))
-        elif key == 'y':
-            object.__setattr__(self, 'pos', (self.pos[0], value))
+    __slots__ = ('_charname', '_hp', '_maxhp', 'en', '_maxen', '_xp', '_lv', 'mdr', '_at', '_df', '_kills', '_room',
+                 '_weapon', '_wstrength', '_armor', '_adef', '_sp', 'asp', '_gold', '_plot', '_time', '_currentsong',
+                 'menuchoice', 'custom_data', 'inventory', 'dimensional_box_a', 'dimensional_box_b', 'phone', 'flags',
+                 'savefile', 'inifile', '_pos', 'movespeed', '_dir', 'sprites', 'sprite', 'moving', 'journal', 'saved')
+    UNSAVED = {'hp', 'pos', 'dir'}  # journalled, but not in a SAVE
+
+    charname = Tracked()
+    hp = Tracked()
+    maxhp = Tracked()
+    maxen = Tracked()
+    xp = Tracked()
+    lv = Tracked()
+    at = Tracked()
+    df = Tracked()
+    kills = Tracked()
+    room = Tracked()
+    wstrength = Tracked()
+    adef = Tracked()
+    sp = Tracked()
+    gold = Tracked()
+    plot = Tracked()
+    time = Tracked()
+    currentsong = Tracked()
+    dir = Tracked()
+
+    stats = [(1, 20, 10, 10, 0),
+             (2, 24, 12, 10, 10),
+             (3, 28, 14, 10, 30),
+             (4, 32, 16, 10, 70),
+             (5, 36, 18, 11, 120),
+             (6, 40, 20, 11, 200),
+             (7, 44, 22, 11, 300),
+             (8, 48, 24, 11, 500),
+             (9, 52, 26, 12, 800),
+             (10, 56, 28, 12, 1200),
+             (11, 60, 30, 12, 1700),
+             (12, 64, 32, 12, 2500),
+             (13, 68, 34, 13, 3500),
+             (14, 72, 36, 13, 5000),
+             (15, 76, 38, 13, 7000),
+             (16, 80, 40, 13, 10000),
+             (17, 84, 42, 14, 15000),
+             (18, 88, 44, 14, 25000),
+             (19, 92, 46, 14, 50000),
+             (20, 99, 48, 14, 99999)]
+
+    @property
+    def weapon(self):
+        return self._weapon
+
+    @weapon.setter
+    def weapon(self, value):
+        self._weapon = value
+        self.journal.record('weapon')
+        self.wstrength = value.strength
+
+    @property
+    def armor(self):
+        return self._armor
+
+    @armor.setter
+    def armor(self, value):
+        self._armor = value
+        self.journal.record('armor')
+        self.adef = value.defense
+
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        self._pos = value
+        self.journal.record('pos')
+
+    @property
+    def x(self):
+        return self._pos[0]
+
+    @x.setter
+    def x(self, value):
+        self.pos = (value, self._pos[1])
+
+    @property
+    def y(self):
+        return self._pos[1]
+
+    @y.setter
+    def y(self, value):
+        self.pos = (self._pos[0], value)
 
     def __init__(self):
+        self.journal = Journal()
         self.charname = "CHARA"
         self.hp = 20
         self.maxhp = 20
@@ -37,9 +187,9 @@ class Frisk:
         self.df = 10
         self.kills = 0
         self.room = 0
-        self.weapon = item.Stick()
+        self.weapon = item.get_item(3)  # Stick
         self.wstrength = 0
-        self.armor = item.Bandage()
+        self.armor = item.get_item(4)  # Bandage
         self.adef = 0
         self.sp = 4
         self.asp = 0
@@ -50,41 +200,42 @@ class Frisk:
         self.menuchoice = [0] * 4
         self.custom_data = []  # Undertale doesn't check file0 lines after 549 for data, so use this in any way.
         self.inventory = []
-        self.dimensional_box_a = [item.ToughGlove()]
+        self.dimensional_box_a = [item.get_item(14)]  # Tough Glove
         self.dimensional_box_b = []
         self.phone = []
-        self.flags = [0] * 512
-        self.savefile = 'file0'
-        self.inifile = 'undertale.ini'
+        self.flags = Flags(self.journal)
+        self.savefile = os.path.join(globals.save_dir, 'file0')
+        self.inifile = os.path.join(globals.save_dir, 'undertale.ini')
         self.pos = (400, 300)
-        self.x = 400
-        self.y = 300
         self.movespeed = 5
         self.dir = 2
         self.sprites = [sprite.Sprite.get_sprite('spr_maincharau'), sprite.Sprite.get_sprite('spr_maincharar'),
                         sprite.Sprite.get_sprite('spr_maincharad'), sprite.Sprite.get_sprite('spr_maincharal')]
         self.sprite = None
         self.moving = False
-        self.stats = [(1, 20, 10, 10, 0),
-                      (2, 24, 12, 10, 10),
-                      (3, 28, 14, 10, 30),
-                      (4, 32, 16, 10, 70),
-                      (5, 36, 18, 11, 120),
-                      (6, 40, 20, 11, 200),
-                      (7, 44, 22, 11, 300),
-                      (8, 48, 24, 11, 500),
-                      (9, 52, 26, 12, 800),
-                      (10, 56, 28, 12, 1200),
-                      (11, 60, 30, 12, 1700),
-                      (12, 64, 32, 12, 2500),
-                      (13, 68, 34, 13, 3500),
-                      (14, 72, 36, 13, 5000),
-                      (15, 76, 38, 13, 7000),
-                      (16, 80, 40, 13, 10000),
-                      (17, 84, 42, 14, 15000),
-                      (18, 88, 44, 14, 25000),
-                      (19, 92, 46, 14, 50000),
-                      (20, 99, 48, 14, 99999)]
+        self.saved = None  # (path, journal version, untracked()) of the SAVE file last written or loaded
+
+    def changes_since(self, version: int) -> (int, set):
+        """
+        :return: 2-tuple of the current journal version and the names of the fields changed after version.
+        """
+        return self.journal.version, self.journal.since(version)
+
+    def untracked(self) -> tuple:
+        """
+        The SAVEd values the journal can't see, being lists changed in place.
+        """
+        return (tuple(int(i) for i in self.inventory), tuple(int(i) for i in self.phone), tuple(self.menuchoice),
+                tuple(str(i) for i in self.custom_data))
+
+    def unsaved(self, path: str) -> bool:
+        """
+        Would SAVEing to path change it? Only if it isn't where the last SAVE went, or the journal or the
+        untracked values changed since.
+        """
+        if self.saved is None or self.saved[0] != path or self.saved[2] != self.untracked():
+            return True
+        return bool(self.changes_since(self.saved[1])[1] - self.UNSAVED)
 
     def xp_incr(self, xp: int):
         self.xp += xp
@@ -108,24 +259,59 @@ class Frisk:
         m,s = divmod(int(self.time), 60)
         return '{}:{}'.format(str(m).rjust(2,'0'), str(s).rjust(2,'0'))
 
-    def go_to_room(self, room:rooms.Room):
-        globals.room.on_exit()
-        globals.room = room
-        globals.room.on_enter()
+    def go_to_room(self, room, fade: float = None):
+        """
+        Move to another room: the room itself, its class, or its number or name. Returns at once; the room is
+        built in the background and shown between two frames, behind a fade (see rooms.transition).
+        """
+        return transition.go(room, fade)
 
-    def save(self, file: str = None):
+    def save(self, file: str = None, background: bool = False):
         """
         "You're filled with determination..."
         SAVE the non-volatile parameters of this object.
         If passed a writable file, write to that file.
-        If passed a string, write to a file with that name.
+        If passed a string, write to a file with that name, atomically: a crash mid-write leaves the old SAVE.
         If the string is empty, write to the default file (file0).
+        If background is set, the file is written by savedata.writer and this returns without waiting for it.
+        A file this Frisk last SAVEd to or loaded from is not written again if nothing SAVEd changed since.
         If no params, return the string that would have been written.
         """
         self.time = globals.time
-        self.room = globals.room.id
-        globals.last_save_room_name = globals.room.name
-        o = ["0"] * 550
+        if globals.room is not None:  # none yet while starting up; the loaded room stands
+            self.room = globals.room.id
+            globals.last_save_room_name = globals.room.name
+        config.get_config(self.inifile).flush()  # a SAVE is a good time to write the INI too
+        if file == '':
+            file = self.savefile
+        if isinstance(file, str) and not self.unsaved(file):
+            return
+        o = savedata.to_text(self.to_values(), [str(i) for i in self.custom_data])
+        if file is None:
+            return o
+        if not isinstance(file, str):
+            file.write(o)
+            file.close()
+            return
+        saved = (file, self.journal.version, self.untracked())
+        if background:
+            self.saved = saved
+
+            def done(error):
+                if error is not None and self.saved is saved:
+                    self.saved = None  # the file may hold anything, so write it next time
+
+            savedata.writer.write(file, o, done)
+        else:
+            savedata.atomic_write(file, o)
+            self.saved = saved
+
+    def to_values(self) -> list:
+        """
+        Return the SAVEd parameters as a list indexed by file0 line number.
+        """
+        o = [0] * (savedata.LINES + 1)
+        o[0] = None
         o[1] = self.charname
         o[2] = self.lv
         o[3] = self.maxhp
@@ -150,29 +336,50 @@ class Frisk:
                 break
         o[29] = int(self.weapon)
         o[30] = int(self.armor)
-        for i, j in zip(range(31, 543), self.flags):
-            o[i] = j
+        o[31:543] = self.flags.tolist()
         o[543] = self.plot
         for i, j in zip(range(544, 547), self.menuchoice):
             o[i] = j
         o[547] = self.currentsong
         o[548] = int(self.room)
         o[549] = self.time
-        o.extend(self.custom_data)
-        o = [str(i) for i in o]
-        f = None
-        if file is not None:
-            if file == '':
-                file = self.savefile
-            try:
-                f = open(file, "w")
-            except TypeError:
-                f = file
-            finally:
-                f.write('\n'.join(o[1:]))
-                f.close()
-        else:
-            return '\n'.join(o[1:])
+        return o
+
+    def snapshot(self) -> bytes:
+        """
+        Return the full state, position included, as a binary snapshot: much quicker to make and restore
+        than a SAVE file. savedata.snapshot_to_text turns it into file0 contents.
+        """
+        return savedata.pack(self.to_values(), (int(self.x), int(self.y), self.dir),
+                             [str(i) for i in self.custom_data])
+
+    def restore(self, data: bytes):
+        """
+        Restore the state from a snapshot. Unlike load, this doesn't change the current room.
+        """
+        values, position, custom_data = savedata.unpack(data)
+        self.set_values(values, custom_data)
+        self.pos = position[:2]
+        self.dir = position[2]
+
+    def set_values(self, values: list, custom_data: list):
+        """
+        Set the SAVEd parameters from a list indexed by file0 line number, as to_values returns.
+        """
+        self.charname = values[1]
+        self.lv, self.maxhp, self.maxen, self.at, self.wstrength, self.df, self.adef, self.sp, self.xp, self.gold, \
+            self.kills = values[2:13]
+        self.inventory = list(filter(None, [item.get_item(i) for i in values[13:29:2]]))
+        self.phone = list(filter(None, [item.get_item(i) for i in values[14:29:2]]))
+        self.weapon = item.get_item(values[29])
+        self.armor = item.get_item(values[30])
+        self.flags[:] = [int(i) for i in values[31:543]]
+        self.plot = values[543]
+        self.menuchoice[:3] = values[544:547]
+        self.currentsong = values[547]
+        self.room = values[548]
+        self.time = values[549]
+        self.custom_data = custom_data
 
     def load(self, file: str):
         """
@@ -183,52 +390,26 @@ class Frisk:
         """
         try:
             if isinstance(file, str) and '\n' in file:
-                i = file.split('\n')
+                text = file
             else:
                 try:
                     f = open(file)
                 except TypeError:
                     f = file
                 finally:
-                    i = f.read().split("\n")
+                    text = f.read()
                     f.close()
-            i = [None] + i  # for easier indexing
-            self.charname = i[1]
-            self.lv = int(i[2])
-            self.maxhp = int(i[3])
-            self.maxen = int(i[4])
-            self.at = int(i[5])
-            self.wstrength = int(i[6])
-            self.df = int(i[7])
-            self.adef = int(i[8])
-            self.sp = int(i[9])
-            self.xp = int(i[10])
-            self.gold = int(i[11])
-            self.kills = int(i[12])
-            self.inventory = [None] * 8
-            for j, k in zip(range(8), i[13:29:2]):
-                self.inventory[j] = item.get_item(int(k))
-            self.inventory = list(filter(None, self.inventory))
-            self.phone = [None] * 8
-            for j, k in zip(range(8), i[14:29:2]):
-                self.phone[j] = item.get_item(int(k))
-            self.phone = list(filter(None, self.phone))
-            self.weapon = item.get_item(int(i[29]))
-            self.armor = item.get_item(int(i[30]))
-            for j, k in zip(range(512), i[31:543]):
-                self.flags[j] = int(k)
-            self.plot = i[543]
-            for j, k in zip(range(4), i[544:547]):
-                self.menuchoice[j] = int(k)
-            self.currentsong = int(i[547])  # TODO: figure out how to define songs.
-            if int(i[547]) in list(range(0, 5)) + list(range(239, 264)) + list(range(239, 264)) and not globals.DEBUG:
+            parsed = savedata.parse(text)
+            if parsed.errors:
+                raise ValueError('\n'.join('line {} ({}) {}'.format(*j) for j in parsed.errors))
+            if parsed.values[548] in savedata.DOGCHECK_ROOMS and not globals.DEBUG:
                 raise globals.UndertaleError
-            self.room = int(i[547])
-            self.time = int(i[549])
+            self.set_values(parsed.values, parsed.custom_data)
+            if isinstance(file, str) and '\n' not in file:
+                self.saved = (file, self.journal.version, self.untracked())
             globals.time = self.time
-            globals.room = rooms.get_room(self.room)
-            globals.last_save_room_name = globals.room.name
-            self.custom_data = i[550:]
+            # only the name: the caller decides which room to show, so building this one would be wasted
+            globals.last_save_room_name = rooms.loader.loader.name(self.room)
         except:
             exc_type, exc_value, exc_traceback = sys.exc_info()
             output = traceback.format_exception(exc_type, exc_value, exc_traceback)
@@ -244,21 +425,9 @@ class Frisk:
         kind can be a bool, an int or a float, and if so, return the corresponding type.
         If it is None, return an str.
         If the INI doesn't exist, or the corresponding section or option are missing, return None.
+        The file is read once and kept in memory by config.
         """
-        c = configparser.ConfigParser()
-        try:
-            with open(self.inifile) as o:
-                c.read_string(o.read())
-        except FileNotFoundError:
-            return None
-        if isinstance(kind, int):
-            return c.getint(section, option, fallback=None)
-        elif isinstance(kind, float):
-            return c.getfloat(section, option, fallback=None)
-        elif isinstance(kind, bool):
-            return c.getboolean(section, option, fallback=None)
-        else:
-            return c.get(section, option, fallback=None)
+        return config.get_config(self.inifile).get(section, option, kind)
 
     def set_ini_value(self, section: str, option: str, value):
         """
@@ -266,13 +435,7 @@ class Frisk:
         section and option are strings.
         value is the value to write.
         This is safe to use if the INI file doesn't exist.
+        The file is written shortly after, together with any other values set meanwhile;
+        config.flush_all writes it right away.
         """
-        c = configparser.ConfigParser()
-        try:
-            with open(self.inifile) as o:
-                c.read_string(o.read())
-        except FileNotFoundError:
-            c[section] = {}
-        c[section][option] = str(value)
-        with open(self.inifile, 'w') as o:
-            c.write(o)
+        config.get_config(self.inifile).set(section, option, value)
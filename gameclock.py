@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+# coding=utf-8
+import threading
+import time
+import pygame
+
+FPS = 30
+LOCKSTEP_TIMEOUT = 5.0  # seconds a tick waits for a following thread stuck on something other than the clock
+
+
+class GameClock:
+    """
+    Counts game frames. The main loop ticks it once per frame; anything that has to stay in step with
+    the game (the typewriter, timed waits) counts frames on it instead of sleeping on its own.
+
+    Threads started through following() are followers. In lockstep mode, which replays use, every tick
+    waits until each follower has done its work for the new frame and waits for a later one, so what
+    they do lands on the same frame however fast the game runs.
+    """
+
+    def __init__(self, fps: int = FPS):
+        self.fps = fps
+        self.frame = 0
+        self.realtime = True  # if False, tick does not throttle to fps (headless runs go as fast as they can)
+        self.lockstep = False
+        self.followers = set()  # thread idents
+        self.waiting = {}  # follower thread ident -> frame it waits for
+        self.starting = 0  # followers made by following() whose threads haven't started yet
+        self.stalls = []  # (frame, names of the threads that were late) for every tick that gave up waiting
+        self.last_tick = 0.0
+        self.condition = threading.Condition()
+        self.clock = pygame.time.Clock()
+
+    def tick(self) -> int:
+        """
+        Advance by one frame and wake everyone waiting for it.
+        :return: milliseconds since the previous tick, 0 if not running in real time.
+        """
+        self.last_tick = time.time()
+        return self.advance()
+
+    def advance(self) -> int:
+        with self.condition:
+            self.frame += 1
+            self.condition.notify_all()
+            if self.lockstep and threading.get_ident() not in self.followers:
+                if not self.condition.wait_for(self.caught_up, LOCKSTEP_TIMEOUT):
+                    self.stalled()
+        if self.realtime:
+            return self.clock.tick(self.fps)
+        return 0
+
+    def is_driven(self) -> bool:
+        """Is something (normally the main loop) ticking this clock right now?"""
+        return time.time() - self.last_tick < 0.5
+
+    def stalled(self) -> None:
+        """
+        A follower didn't get back to the clock in time, so the frame went ahead without it: note which.
+        """
+        late = [i for i in self.followers if self.waiting.get(i, 0) <= self.frame]
+        names = {i.ident: i.name for i in threading.enumerate()}
+        self.stalls.append((self.frame, [names.get(i, str(i)) for i in late]))
+        print('Frame {}: gave up waiting {}s for {}; lockstep is broken from here on'.format(
+            self.frame, LOCKSTEP_TIMEOUT, ', '.join(self.stalls[-1][1]) or 'a thread still starting'))
+
+    def caught_up(self) -> bool:
+        """Is every follower waiting for a frame after this one?"""
+        return not self.starting and all(self.waiting.get(i, 0) > self.frame for i in self.followers)
+
+    def wait(self, frames: int = 1, timeout: float = None) -> bool:
+        """
+        Block until this many frames have passed.
+        :return: False if the timeout in seconds ran out first.
+        """
+        ident = threading.get_ident()
+        with self.condition:
+            target = self.frame + frames
+            if ident in self.followers:
+                self.waiting[ident] = target
+                self.condition.notify_all()
+            try:
+                return self.condition.wait_for(lambda: self.frame >= target, timeout)
+            finally:
+                self.waiting.pop(ident, None)
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Wait for seconds of game time: counted in frames in lockstep mode, on the wall clock otherwise.
+        """
+        if self.lockstep:
+            self.wait(max(int(round(self.frames(seconds))), 1))
+        else:
+            time.sleep(seconds)
+
+    def following(self, target: callable) -> callable:
+        """
+        Wrap a thread's target so the thread follows the clock while it runs. Call it just before starting
+        the thread: from then on, ticks wait for the thread too.
+        """
+        with self.condition:
+            self.starting += 1
+
+        def run(*args, **kwargs):
+            ident = threading.get_ident()
+            with self.condition:
+                self.starting -= 1
+                self.followers.add(ident)
+            try:
+                return target(*args, **kwargs)
+            finally:
+                with self.condition:
+                    self.followers.discard(ident)
+                    self.waiting.pop(ident, None)
+                    self.condition.notify_all()
+
+        return run
+
+    def next_frame(self) -> None:
+        """
+        Block until the next frame. If nothing is ticking the clock, tick it from here instead,
+        so frame-based code still runs outside of the main loop.
+        """
+        if self.lockstep and self.is_driven():
+            self.wait(1)  # no timeout: the main loop won't tick without this thread, so none is needed
+        elif not (self.is_driven() and self.wait(1, 0.5)):
+            self.advance()
+
+    def frames(self, seconds: float) -> float:
+        return seconds * self.fps
+
+
+clock = GameClock()
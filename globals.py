@@ -25,6 +25,7 @@ running = True
 event_lock = False
 layers = {}
 
+save_dir = ''  # where file0, undertale.ini and the system_information files are; replays use a copy
 chara = frisk.Frisk()
 display = pygame.Surface((1, 1))
 room = None
@@ -1,27 +1,259 @@
 #!/usr/bin/python3
-import pygame
+import collections
+import threading
 import time
+import pygame
+import gameclock
 import globals
 
 
+def wait_event(timeout: int) -> pygame.event.EventType:
+    """
+    Block until the next event arrives, or timeout milliseconds pass. Return NOEVENT on timeout.
+    Old pygame versions can't wait with a timeout, so fall back to polling every few milliseconds there.
+    """
+    try:
+        return pygame.event.wait(timeout)
+    except TypeError:
+        stop_at = time.time() + timeout / 1000
+        event = pygame.event.poll()
+        while event.type == pygame.NOEVENT and time.time() < stop_at:
+            pygame.time.wait(5)
+            event = pygame.event.poll()
+        return event
+
+
+FOCUS_ROOM = 0
+FOCUS_POPUP = 10
+FOCUS_TEXT = 20
+
+
+class Consumer:
+    """
+    Queue of events for one reader. The dispatcher appends on the main thread and the reader pops on its own;
+    deque appends and pops are atomic, so neither side takes a lock.
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.events = collections.deque()
+        self.ready = threading.Event()
+
+    def __repr__(self):
+        return '<Consumer {}>'.format(self.name)
+
+    def put(self, event: pygame.event.EventType) -> None:
+        self.events.append(event)
+        self.ready.set()
+
+    def get(self) -> [pygame.event.EventType]:
+        """
+        Return every event queued so far, without waiting.
+        """
+        out = []
+        self.ready.clear()
+        while 1:
+            try:
+                out.append(self.events.popleft())
+            except IndexError:
+                return out
+
+    def wait(self, timeout: float = None) -> pygame.event.EventType:
+        """
+        Return the next event, sleeping until there is one. Return None if timeout seconds pass first.
+        """
+        while 1:
+            try:
+                return self.events.popleft()
+            except IndexError:
+                self.ready.clear()
+                if self.events:
+                    continue
+                if not self.ready.wait(timeout):
+                    return None
+
+
+class Dispatcher:
+    """
+    The only reader of the SDL event queue. pump, called once per frame by the main loop, fans events out:
+    key events go to the consumer on top of the focus stack if there is one, everything else (and key
+    events when nothing has focus) goes to every subscribed consumer. Taps see every event first.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # guards the lists below, not the queues
+        self.consumers = []
+        self.focus = []  # (priority, consumer), highest priority and latest pushed last
+        self.taps = []
+        self.pressed = set()
+        self.last_pump = 0.0
+        self.source = pygame.event.get  # replaced by replay.Replayer during a replay
+
+    def subscribe(self, consumer: Consumer) -> Consumer:
+        with self.lock:
+            if consumer not in self.consumers:
+                self.consumers.append(consumer)
+        return consumer
+
+    def unsubscribe(self, consumer: Consumer) -> None:
+        with self.lock:
+            if consumer in self.consumers:
+                self.consumers.remove(consumer)
+
+    def push_focus(self, consumer: Consumer, priority: int = FOCUS_POPUP) -> Consumer:
+        """
+        Route key events to this consumer until it is popped, or something with at least its priority is pushed.
+        """
+        with self.lock:
+            index = len(self.focus)
+            while index > 0 and self.focus[index - 1][0] > priority:
+                index -= 1
+            self.focus.insert(index, (priority, consumer))
+        return consumer
+
+    def pop_focus(self, consumer: Consumer) -> None:
+        with self.lock:
+            self.focus = [i for i in self.focus if i[1] is not consumer]
+
+    def has_focus(self, consumer: Consumer) -> bool:
+        focus = self.focus
+        return len(focus) > 0 and focus[-1][1] is consumer
+
+    def is_pressed(self, key: int) -> bool:
+        return key in self.pressed
+
+    def is_pumping(self) -> bool:
+        """Is the main loop reading events right now?"""
+        return time.time() - self.last_pump < 0.5
+
+    def pump(self) -> None:
+        self.last_pump = time.time()
+        self.dispatch(self.source())
+
+    def dispatch(self, events: [pygame.event.EventType]) -> None:
+        with self.lock:
+            consumers = list(self.consumers)
+            focused = self.focus[-1][1] if self.focus else None
+            taps = list(self.taps)
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                self.pressed.add(event.key)
+            elif event.type == pygame.KEYUP:
+                self.pressed.discard(event.key)
+            for i in taps:
+                i(event)
+            if focused is not None and event.type in [pygame.KEYDOWN, pygame.KEYUP]:
+                focused.put(event)
+            else:
+                for i in consumers:
+                    i.put(event)
+
+
+dispatcher = Dispatcher()
+
+
+class InputService:
+    """
+    Keeps track of held and recently pressed keys, and lets any number of threads wait for a keypress.
+    While the dispatcher is pumping, it feeds this service and waiters just sleep on a condition variable.
+    Otherwise one waiter at a time reads the event queue itself, blocking in pygame.event.wait, and hands what
+    it read to the dispatcher; the others sleep until it has read something. Nobody spins.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.held = set()
+        self.pressed = collections.deque(maxlen=64)  # (sequence number, key) of the latest KEYDOWNs
+        self.sequence = 0
+        self.reading = False
+
+    def feed(self, event: pygame.event.EventType) -> None:
+        """
+        Take note of an event and wake up the waiters.
+        """
+        with self.condition:
+            if event.type == pygame.KEYDOWN:
+                self.held.add(event.key)
+                self.sequence += 1
+                self.pressed.append((self.sequence, event.key))
+            elif event.type == pygame.KEYUP:
+                self.held.discard(event.key)
+            self.condition.notify_all()
+
+    def find_key(self, keys: list, since: int):
+        for seq, key in self.pressed:
+            if seq > since and key in keys:
+                return key
+        for i in keys:
+            if i in self.held:
+                return i
+        return None
+
+    def await_keypress(self, keys: list, timeout: int = 0):
+        if gameclock.clock.lockstep:
+            return self.await_in_step(keys, timeout)
+        started_at = time.time()
+        try:
+            keypress = pygame.key.get_pressed()
+            for i in keys:
+                if keypress[i]:
+                    return 0, i
+        except (pygame.error, IndexError):
+            pass
+        with self.condition:
+            since = self.sequence
+            while 1:
+                found = self.find_key(keys, since)
+                elapsed = int((time.time() - started_at) * 1000)
+                if found is not None:
+                    return elapsed, found
+                if timeout != 0 and elapsed >= timeout:
+                    return elapsed, None
+                remaining = timeout - elapsed if timeout != 0 else 1000
+                if self.reading or dispatcher.is_pumping():
+                    self.condition.wait(min(remaining, 500) / 1000)
+                    continue
+                self.reading = True
+                self.condition.release()
+                try:
+                    event = wait_event(remaining)
+                    if event.type != pygame.NOEVENT:
+                        # through the dispatcher, whose tap feeds this service, so a QUIT or anything else read
+                        # here still reaches the room instead of being dropped
+                        dispatcher.dispatch([event])
+                finally:
+                    self.condition.acquire()
+                    self.reading = False
+
+    def await_in_step(self, keys: list, timeout: int = 0):
+        """
+        await_keypress counted in game frames rather than wall time, for lockstep runs: keys arrive as the
+        main loop pumps them, once a frame.
+        """
+        with self.condition:
+            since = self.sequence
+        frames = 0
+        while 1:
+            with self.condition:
+                found = self.find_key(keys, since)
+            elapsed = int(frames * 1000 / gameclock.clock.fps)
+            if found is not None:
+                return elapsed, found
+            if timeout != 0 and elapsed >= timeout:
+                return elapsed, None
+            gameclock.clock.next_frame()
+            frames += 1
+
+
+service = InputService()
+dispatcher.taps.append(service.feed)
+
+
 def await_keypress(keys: list, timeout: int = 0):
     """Wait until a key from the keys list is pressed, or the timeout in milliseconds is reached, whichever comes first.
     Return a 2-tuple of milliseconds that have passed (not reliable) and one of the pressed keys that match, None if timeout is reached.
     If timeout is 0, then only a successful keypress will return."""
-    started_at = time.time()
-    seeked_key = None
-    while not seeked_key:
-        pygame.event.pump()  # TODO: check if this breaks multithreaded keypress seek.
-        keypress = pygame.key.get_pressed()
-        for i in keys:
-            if keypress[i]:
-                seeked_key = i
-                break
-        if int((time.time() - started_at) * 1000) >= timeout != 0:
-            break
-            return int((time.time() - started_at) * 1000), None
-
-    return int((time.time() - started_at) * 1000), seeked_key
+    return service.await_keypress(keys, timeout)
 
 
 def get_single_menu_interaction() -> int:
@@ -1,13 +1,34 @@
 #!/usr/bin/python3
 # coding=utf-8
+import collections
 import os
 import random
+import re
+import threading
+
+import datacache
+
+CODE_DIR = 'decompilation/code/'
+SCRIPTS = ['gml_Script_scr_itemnamelist.gml.lsp', 'gml_Script_scr_itemnameb.gml.lsp',
+           'gml_Script_scr_itemvalue.gml.lsp', 'gml_Script_scr_itemdesc.gml.lsp',
+           'gml_Script_scr_weaponeq.gml.lsp', 'gml_Script_scr_armoreq.gml.lsp']
+VERSION = 1
 
 
 class Item:
+    """
+    An item. Instances are shared: every inventory slot holding an item refers to the one object get_item
+    returns for its id, so the registry freezes each one once it is filled in; setting anything then raises.
+    """
+    __slots__ = ('id', 'sell0', 'sell1', 'sell2', 'strength', 'defense', 'name', 'shortname', 'seriousname', 'value',
+                 'description', 'frozen')
+
     def __int__(self):
         return int(self.id)
 
+    def __bool__(self):
+        return self.id != 0  # the Null item marks an empty slot
+
     def __init__(self):
         self.id = 0
         self.sell0 = 0
@@ -18,15 +39,35 @@ class Item:
         self.name = None
         self.shortname = None
         self.seriousname = None
+        self.value = 0
+        self.description = ()
 
-    def check(self):
-        pass
+    def __setattr__(self, key, value):
+        if getattr(self, 'frozen', False):
+            raise AttributeError('item {} is shared by every slot holding it, so it is read-only'.format(self.id))
+        object.__setattr__(self, key, value)
 
-    def use(self, chara):
+    def freeze(self) -> 'Item':
+        self.frozen = True
+        return self
+
+    def check(self):
+        return list(self.description) or None
+
+    def take(self, chara, slot: int) -> None:
+        """
+        Remove the item from the inventory slot the player picked. Other slots may hold the very same
+        instance, so it is removed by position, not by value.
+        """
+        if chara.inventory[slot] is not self:
+            raise ValueError('slot {} does not hold {}'.format(slot, self.name))
+        del chara.inventory[slot]
+
+    def use(self, chara, slot: int):
         pass
 
-    def drop(self, chara):
-        chara.inventory.remove(self)
+    def drop(self, chara, slot: int):
+        self.take(chara, slot)
         msgtype = random.randint(0, 100)
         msg = '* The ' + self.name + ' was&  thrown away.'
         msg = '* You put the ' + self.name + '&  on the ground and gave it a&  little pat.' if msgtype > 40 else msg
@@ -36,18 +77,24 @@ class Item:
 
 
 class Weapon(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.strength = 0
 
 
 class Armor(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.defense = 0
 
 
 class Null(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 0
@@ -58,14 +105,16 @@ class Null(Item):
     def check(self):
         return ['* If you are reading this,&  I messed up somehow./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         os.abort()
 
-    def drop(self, chara):
+    def drop(self, chara, slot: int):
         os.abort()
 
 
 class MonsterCandy(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 1
@@ -79,14 +128,16 @@ class MonsterCandy(Item):
     def check(self):
         return ['* "Monster Candy" - Heals 10 HP&* Has a distinct,^1 &  non-licorice flavor./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(10)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* You ate the Monster Candy.' + random.choice(
             [' &* Very un-licorice-like.', ' &* ... tastes like licorice.'])]
 
 
 class CroquetRoll(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 2
@@ -100,13 +151,15 @@ class CroquetRoll(Item):
     def check(self):
         return ['* "Croquet Roll" - Heals 15 HP&* Fried dough traditionally&  served with a mallet./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(10)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return [random.choice(['* You hit the Croquet Roll into&  your mouth.', '* You ate the Croquet Roll.'])]
 
 
 class Stick(Weapon):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 3
@@ -120,11 +173,13 @@ class Stick(Weapon):
     def check(self):
         return ['* "Stick" - Weapon AT 0&* Its bark is worse than&  its bite./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         return ['* You threw the stick away^1.&* Then picked it back up./%']
 
 
 class Bandage(Armor):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 4
@@ -138,13 +193,15 @@ class Bandage(Armor):
     def check(self):
         return ['* "Bandage" - Heals 10 HP&* It has already been used&  several times./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(10)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* You re-applied the bandage.' + '&* Still kind of gooey.']
 
 
 class RockCandy(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 5
@@ -158,13 +215,15 @@ class RockCandy(Item):
     def check(self):
         return ['* "Rock Candy" - Heals 1 HP&* Here is a recipe to make&  this at home:/', '* 1. Find a rock/%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(1)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* You ate the Rock Candy.']
 
 
 class PumpkinRings(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 6
@@ -178,13 +237,15 @@ class PumpkinRings(Item):
     def check(self):
         return ['* "Pumpkin Rings" - Heals 8 HP&* A small pumpkin cooked&  like onion rings./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(8)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* You ate the Pumpkin Rings.']
 
 
 class StoicOnion(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 8
@@ -198,13 +259,15 @@ class StoicOnion(Item):
     def check(self):
         return ['* "Stoic Onion" - Heals 5 HP&* Even eating it raw^1, the&  tears just won\'t come./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(5)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* You ate the Stoic Onion.' + "&* You didn't cry..."]
 
 
 class GhostFruit(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 9
@@ -218,13 +281,15 @@ class GhostFruit(Item):
     def check(self):
         return ['* "Ghost Fruit" - Heals 16 HP&* If eaten^1, it will never&  pass to the other side./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(16)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* You ate the Ghost Fruit.']
 
 
 class ToughGlove(Weapon):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 14
@@ -239,11 +304,13 @@ class ToughGlove(Weapon):
     def check(self):
         return ['* "Tough Glove" - Weapon AT 5&* A worn pink leather glove^1.&* For five-fingered folk./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         raise NotImplementedError("weapons not supported yet")
 
 
 class PuppydoughIcecream(Item):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.id = 18
@@ -257,11 +324,162 @@ class PuppydoughIcecream(Item):
     def check(self):
         return ['* "Puppydough Icecream"&* Heals 28 HP^1.&* Made by young pups./%']
 
-    def use(self, chara):
+    def use(self, chara, slot: int):
         chara.heal(28)
-        chara.inventory.remove(self)
+        self.take(chara, slot)
         return ['* Mmm^1! Tastes like puppies.']
 
 
-def get_item(item: int):  # TODO: implement this.
-    return Null()
+ItemData = collections.namedtuple('ItemData', ['id', 'name', 'shortname', 'seriousname', 'value', 'description',
+                                               'strength', 'defense'])
+
+_LABEL = re.compile(r'^(0x[0-9A-F]+):$')
+_CASE = re.compile(r'if \(== self\.(\w+) (-?\d+)s\) goto (0x[0-9A-F]+)')
+_SERIOUS = re.compile(r'if !\(== global\.seriousbattle (\d)s\) goto (0x[0-9A-F]+)')
+_ASSIGN = re.compile(r'stog\.(\w+)\[(.*?)\] = ("(?:[^"\\]|\\.)*"|-?\d+s)$')
+_EQUIP = re.compile(r'if !\(== global\.(weapon|armor) (\d+)s\) goto .*\n.*\n\s*global\.(?:wstrength|adef) = (\d+)s$',
+                    re.MULTILINE)
+
+
+def _value(raw: str):
+    if raw.startswith('"'):
+        return raw[1:-1].replace('\\"', '"')
+    return int(raw[:-1])
+
+
+def read_switch(path: str, key: str, target: str) -> {int: [(int, int, object)]}:
+    """
+    Read a decompiled script that is one big switch on self.key assigning to stog.target.
+    :return: for each case, the (seriousbattle it depends on or None, array index, value) it assigns.
+    """
+    with open(path) as f:
+        lines = [i.strip() for i in f]
+    cases = {}
+    for i in lines:
+        m = _CASE.match(i)
+        if m and m.group(1) == key:
+            cases.setdefault(m.group(3), []).append(int(m.group(2)))
+    out = {}
+    current = None
+    serious = None
+    serious_until = None
+    for i in lines:
+        m = _LABEL.match(i)
+        if m:
+            if m.group(1) == serious_until:
+                serious = serious_until = None
+            if m.group(1) in cases:
+                current = cases[m.group(1)]
+            continue
+        if current is None:
+            continue
+        m = _SERIOUS.match(i)
+        if m:
+            serious, serious_until = int(m.group(1)), m.group(2)
+            continue
+        m = _ASSIGN.match(i)
+        if m and m.group(1) == target:
+            index = int(m.group(2)[:-1]) if re.match(r'^\d+s$', m.group(2)) else 0
+            for j in current:
+                out.setdefault(j, []).append((serious, index, _value(m.group(3))))
+        elif i.startswith('goto ') or i == 'exit':
+            current = None
+            serious = serious_until = None
+    return out
+
+
+def build() -> [ItemData]:
+    """
+    Read every item's names, price, description and equipment bonus out of the decompiled item scripts.
+    """
+    names = read_switch(CODE_DIR + SCRIPTS[0], 'itemid', 'itemname')
+    short = read_switch(CODE_DIR + SCRIPTS[1], 'itemid', 'itemnameb')
+    values = read_switch(CODE_DIR + SCRIPTS[2], 'itemid', 'value')
+    descriptions = read_switch(CODE_DIR + SCRIPTS[3], 'argument0', 'msg')
+    bonuses = {'weapon': {}, 'armor': {}}
+    for script in SCRIPTS[4:]:
+        with open(CODE_DIR + script) as f:
+            for kind, item_id, bonus in _EQUIP.findall(f.read()):
+                bonuses[kind].setdefault(int(item_id), int(bonus))
+    out = []
+    for item_id in sorted(names):
+        shortname = seriousname = None
+        for serious, _, name in short.get(item_id, []):
+            if serious != 1:
+                shortname = name.rstrip()
+            if serious != 0:
+                seriousname = name.rstrip()
+        description = [text for _, _, text in sorted(descriptions.get(item_id, []), key=lambda i: i[1])]
+        out.append(ItemData(item_id, names[item_id][0][2], shortname, seriousname,
+                            values.get(item_id, [(None, 0, 0)])[-1][2], tuple(description),
+                            bonuses['weapon'].get(item_id, None), bonuses['armor'].get(item_id, None)))
+    return out
+
+
+# items whose behaviour is written out above; the rest only have what the game data says
+CLASSES = {0: Null, 1: MonsterCandy, 2: CroquetRoll, 3: Stick, 4: Bandage, 5: RockCandy, 6: PumpkinRings,
+           8: StoicOnion, 9: GhostFruit, 14: ToughGlove, 18: PuppydoughIcecream}
+
+
+class Registry:
+    """
+    One shared instance per item id, in a list indexed by id. Built on first use from the decompiled
+    scripts, which are parsed once and cached.
+    """
+
+    def __init__(self):
+        self.items = None
+        self.data = None
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        with self.lock:
+            if self.items is None:
+                data = datacache.load('items', [CODE_DIR + i for i in SCRIPTS], build, VERSION)
+                items = [None] * (max(i.id for i in data) + 1)
+                for i in data:
+                    items[i.id] = self.make(i)
+                for i, j in CLASSES.items():
+                    if items[i] is None:
+                        items[i] = j().freeze()
+                self.data = {i.id: i for i in data}
+                self.items = items
+
+    def make(self, data: ItemData) -> Item:
+        if data.id in CLASSES:
+            o = CLASSES[data.id]()
+            o.value = data.value
+            o.description = data.description
+            return o.freeze()
+        o = Weapon() if data.strength is not None else Armor() if data.defense is not None else Item()
+        o.id = data.id
+        o.name = data.name
+        o.shortname = data.shortname
+        o.seriousname = data.seriousname
+        o.value = data.value
+        o.description = data.description
+        o.strength = data.strength or 0
+        o.defense = data.defense or 0
+        return o.freeze()
+
+    def get(self, item_id: int) -> Item:
+        if self.items is None:
+            self.load()
+        try:
+            if item_id < 0:
+                raise ValueError('no item has a negative id: {}'.format(item_id))
+            o = self.items[item_id]
+        except (IndexError, TypeError):
+            o = None
+        return self.items[0] if o is None else o
+
+
+registry = Registry()
+
+
+def get_item(item: int) -> Item:
+    """
+    Return the shared instance of the item with this id, or the Null item if there is no such item.
+    Negative ids are rejected with a ValueError rather than counted from the end of the table.
+    """
+    return registry.get(item)
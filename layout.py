@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# coding=utf-8
+import threading
+import pygame
+
+_fonts = {}
+_metrics = {}
+_lock = threading.Lock()
+
+
+class Metrics:
+    """
+    Advance table for a pygame Font. Widths are looked up once per character and remembered,
+    so measuring text never renders anything.
+    """
+
+    def __init__(self, font: pygame.font.Font):
+        self.font = font
+        self.line_height = font.get_linesize()
+        self.advances = {}
+
+    def advance(self, char: str) -> int:
+        try:
+            return self.advances[char]
+        except KeyError:
+            a = self.font.size(char)[0]
+            self.advances[char] = a
+            return a
+
+    def width(self, text: str) -> int:
+        return sum(self.advance(i) for i in text)
+
+
+class BitmapMetrics(Metrics):
+    """
+    Advance table for one of the decompiled bitmap fonts (font.Font), read from its glyph shifts.
+    """
+
+    def __init__(self, bitmap_font):
+        self.font = bitmap_font
+        self.line_height = max([i.frame.height for i in bitmap_font.glyphs.values()] + [0])
+        self.advances = {k: v.shift for k, v in bitmap_font.glyphs.items()}
+
+    def advance(self, char: str) -> int:
+        return self.advances.get(char, 0)
+
+
+def get_font(path: str, size: int) -> pygame.font.Font:
+    """
+    Return a shared Font for this file and size, opening it only the first time.
+    """
+    with _lock:
+        f = _fonts.get((path, size), None)
+        if f is None:
+            f = pygame.font.Font(path, size)
+            _fonts[(path, size)] = f
+        return f
+
+
+def metrics(font) -> Metrics:
+    """
+    Return the cached advance table for a pygame Font or a bitmap font.Font.
+    """
+    with _lock:
+        m = _metrics.get(font, None)
+        if m is None:
+            m = BitmapMetrics(font) if hasattr(font, 'glyphs') else Metrics(font)
+            _metrics[font] = m
+        return m
+
+
+def tokenize(text: str) -> [(str, str)]:
+    """
+    Split Typer markup into (kind, string) tokens, where kind is 'char' for a visible symbol,
+    'newline' for '&' and 'command' for anything that takes up no room.
+    Mirrors Typer.next_symbol.
+    """
+    tokens = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            length = 3 if text[i + 1:i + 2] in ['E', 'M', 'F'] else 2
+            tokens.append(('command', text[i:i + length]))
+            i += length
+        elif c == '^':
+            tokens.append(('command', text[i:i + 2]))
+            i += 2
+        elif c == '&':
+            tokens.append(('newline', c))
+            i += 1
+        elif c == '/':
+            tokens.append(('command', c))
+            i += 1
+        else:
+            tokens.append(('char', c))
+            i += 1
+    return tokens
+
+
+def wrap_markup(text: str, max_width: int, m: Metrics) -> str:
+    """
+    Insert '&' line breaks into Typer markup so that no line is wider than max_width.
+    Commands take no room; existing '&' breaks are kept. Breaks replace the space before the
+    word that does not fit.
+    """
+    out = []
+    width = 0
+    last_space = None  # index in out of the last space on this line, and the width up to it
+    for kind, s in tokenize(text):
+        if kind == 'newline':
+            out.append(s)
+            width = 0
+            last_space = None
+            continue
+        if kind == 'command':
+            out.append(s)
+            continue
+        a = m.advance(s)
+        if width + a > max_width and width > 0:
+            if s == ' ':
+                out.append('&')
+                width = 0
+                last_space = None
+                continue
+            if last_space is not None:
+                index, before = last_space
+                out[index] = '&'
+                width -= before + m.advance(' ')
+            else:
+                out.append('&')
+                width = 0
+            last_space = None
+        if s == ' ':
+            last_space = (len(out), width)
+        out.append(s)
+        width += a
+    return ''.join(out)
+
+
+def fit_font(path: str, text: str, max_width: int, max_size: int, min_size: int = 1) -> pygame.font.Font:
+    """
+    Find the largest size of the font at path whose rendering of text would be narrower than max_width,
+    by binary search over measured widths. Return min_size if even that is too wide.
+    """
+    low = min_size
+    high = max_size
+    while low < high:
+        mid = (low + high + 1) // 2
+        if metrics(get_font(path, mid)).width(text) < max_width:
+            low = mid
+        else:
+            high = mid - 1
+    return get_font(path, low)
@@ -18,6 +18,7 @@ global running
 running = True
 global room
 room = None
+layout = None  # imported below, with the rest of our modules
 if __name__ == '__main__':
     pygame.init()
 
@@ -26,6 +27,19 @@ def scale(img, times):
     return pygame.transform.scale(img, (int(img.get_width() * times), int(img.get_height() * times)))
 
 
+def fit_text(line, max_width):
+    """
+    Render a line of the Annoying Dog's text in the largest size up to 32 that fits in max_width pixels.
+    """
+    if layout is None:  # the game's own modules are broken; don't shrink, just show it
+        return pygame.font.Font(None, 32).render(line, 0, pygame.Color('white'))
+    try:
+        font = layout.fit_font("fonts/determinationmono.ttf", line, max_width, 32)
+    except OSError:
+        font = layout.fit_font(None, line, max_width, 32)  # pygame's default font
+    return font.render(line, 0, pygame.Color('white'))
+
+
 def invoke_dog(text=None, kind=0):
     """
     Show the Annoying Dog with optional text until user quits.
@@ -65,38 +79,25 @@ def invoke_dog(text=None, kind=0):
         (29, 15), "RGB")
     s3 = scale(s3, 4)
     s4 = scale(s4, 4)
+    track = ["mus/mus_dance_of_dog.ogg", "mus/mus_sigh_of_dog.ogg"][kind]
     try:
-        pygame.mixer.music.load(["mus/mus_dance_of_dog.ogg", "mus/mus_sigh_of_dog.ogg"][kind])
-    except pygame.error:
-        pass
+        import music
+        music.play(track, -1)
+    except Exception:  # this screen also shows when the game's own modules are broken
+        try:
+            pygame.mixer.music.load(track)
+            pygame.mixer.music.play(-1)
+        except pygame.error:
+            pass
     text_obj = pygame.Surface((1, 1))
     text_objs = []
     scrollable = False
     cursor = 0
     if isinstance(text, str):
-        length = 1000
-        height = 33
-        while not length < 640:
-            height -= 1
-            try:
-                font = pygame.font.Font("fonts/determinationmono.ttf", height)
-            except OSError:
-                font = pygame.font.SysFont(pygame.font.get_default_font(), height)
-            text_obj = font.render(text, 0, pygame.Color('white'))
-            length = text_obj.get_width()
+        text_obj = fit_text(text, 640)
     elif isinstance(text, list):
         for i in text:
-            length = 1000
-            height = 33
-            while not length < 630:
-                height -= 1
-                try:
-                    font = pygame.font.Font("fonts/determinationmono.ttf", height)
-                except OSError:
-                    font = pygame.font.SysFont(pygame.font.get_default_font(), height)
-                text_obj = font.render(i, 0, pygame.Color('white'))
-                length = text_obj.get_width()
-            text_objs += [text_obj]
+            text_objs += [fit_text(i, 630)]
         scrollable = len(text_objs) != 0
         text_obj = text_objs[0]
 
@@ -107,10 +108,6 @@ def invoke_dog(text=None, kind=0):
     left_pointer = font.render('<', 0, pygame.Color('white'))
     right_pointer = font.render('>', 0, pygame.Color('white'))
 
-    try:
-        pygame.mixer.music.play(-1)
-    except pygame.error:
-        pass
     try:
         while 1:
             for event in pygame.event.get():
@@ -181,6 +178,7 @@ def invoke_dog(text=None, kind=0):
 
 if __name__ == "__main__":
     try:
+        import layout  # first, so the Annoying Dog can fit its text even if what follows fails to import
         import globals
 
         globals.display = pygame.display.set_mode((640, 480))
@@ -190,6 +188,7 @@ if __name__ == "__main__":
         import sfx
         import typer
         import draw
+        import gameclock
 
     except ImportError as e:
         frisk = None
@@ -200,6 +199,7 @@ if __name__ == "__main__":
         sfx = None
         typer = None
         draw = None
+        gameclock = None
         exc_type, exc_value, exc_traceback = sys.exc_info()
         output = traceback.format_exception(exc_type, exc_value, exc_traceback)
         output = [i[:-1].translate({ord('\n'): ':'}) for i in output]
@@ -208,15 +208,18 @@ if __name__ == "__main__":
 
 
 def init():
+    # normally imported above, but not when main is imported as a module
+    global globals, frisk, rooms, draw, gameclock, layout
+    import globals, frisk, rooms, draw, gameclock, layout
     globals.start_time = time.time()
     global clock
     clock = pygame.time.Clock()
     chara = frisk.Frisk()
-    chara.load('file0')
+    chara.load(chara.savefile)
     chara.set_ini_value("General", "time", 0.0)
     chara.save('')
     globals.chara = chara
-    if os.path.exists('system_information_962'):
+    if os.path.exists(os.path.join(globals.save_dir, 'system_information_962')):
         globals.room = rooms.room_nothingness()
     elif False:  # TODO: criteria for summoning Flowey EX  and better room handling should go here
         globals.room = rooms.room_f_intro()
@@ -228,14 +231,20 @@ def init():
 
 
 def maincycle():
-    threading.Thread(target=globals.room.on_enter, name='on_enter runner for first room').start()
+    threading.Thread(target=gameclock.clock.following(globals.room.on_enter),
+                     name='on_enter runner for first room').start()
     while globals.running:
         if globals.room:
             globals.room.draw()
 
 
 if __name__ == "__main__":
+    recorder = None
     try:
+        if '--record' in sys.argv:
+            import replay
+            recorder = replay.Recorder(sys.argv[sys.argv.index('--record') + 1])
+            recorder.start()
         init()
         maincycle()
     except globals.UndertaleError as e:
@@ -254,3 +263,5 @@ if __name__ == "__main__":
 
     finally:
         globals.running = False
+        if recorder is not None:
+            recorder.stop()
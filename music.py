@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# coding=utf-8
+import collections
+import io
+import threading
+import time
+import pygame
+
+import audio
+import perf
+
+
+def resolve(track: str) -> str:
+    """
+    Return the file for a track, given either as a music asset name or as a path.
+    """
+    if '/' in track or '.' in track:
+        return track
+    return audio.music_path(track)
+
+
+class MusicService:
+    """
+    Owns pygame.mixer.music. Every request returns at once and is carried out in order on a worker thread,
+    so opening and decoding a track never stalls a room or the game tick. Tracks can be prefetched ahead of
+    time: their files are read into memory and the switch later only has to decode the header.
+    The mixer plays a single stream, so a crossfade is a fade out of the old track followed by a fade in of
+    the new one.
+    """
+
+    def __init__(self, prefetch_limit: int = 3):
+        self.requests = collections.deque()
+        self.condition = threading.Condition()
+        self.prefetched = collections.OrderedDict()  # path -> file contents
+        self.prefetch_limit = prefetch_limit
+        self.queued = collections.deque()  # (path, loops) to play once the current track ends
+        self.current = None
+        self.data = None  # the stream reads from this while the track plays
+        self.thread = None
+
+    def start(self) -> None:
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True, name='music service')
+                self.thread.start()
+
+    def request(self, *args) -> None:
+        self.start()
+        with self.condition:
+            self.requests.append(args)
+            self.condition.notify()
+
+    def prefetch(self, track: str) -> None:
+        self.request('prefetch', track)
+
+    def play(self, track: str, loops: int = 0, fade_ms: int = 0) -> None:
+        """
+        Switch to a track, dropping anything queued. loops works like pygame.mixer.music.play's.
+        """
+        self.request('play', track, loops, fade_ms)
+
+    def queue(self, track: str, loops: int = 0) -> None:
+        """
+        Play a track when the current one ends, or right away if nothing is playing.
+        """
+        self.request('queue', track, loops)
+
+    def stop(self, fade_ms: int = 0) -> None:
+        self.request('stop', fade_ms)
+
+    def idle(self) -> bool:
+        """Has the worker carried out every request so far?"""
+        with self.condition:
+            return not self.requests
+
+    def run(self) -> None:
+        while 1:
+            with self.condition:
+                while not self.requests:
+                    if self.queued and not self.is_busy():
+                        break
+                    self.condition.wait(0.1 if self.queued else None)
+                command = self.requests.popleft() if self.requests else ('next',)
+            try:
+                getattr(self, 'do_' + command[0])(*command[1:])
+            except (pygame.error, OSError, KeyError) as e:
+                print('music: {} failed: {}'.format(command, e))
+
+    def is_busy(self) -> bool:
+        try:
+            return pygame.mixer.music.get_busy()
+        except pygame.error:
+            return False
+
+    def read(self, path: str) -> bytes:
+        if path in self.prefetched:
+            self.prefetched.move_to_end(path)
+            return self.prefetched[path]
+        with perf.timer('music read', path):
+            with open(path, 'rb') as f:
+                data = f.read()
+        self.prefetched[path] = data
+        while len(self.prefetched) > self.prefetch_limit:
+            self.prefetched.popitem(last=False)
+        return data
+
+    def do_prefetch(self, track: str) -> None:
+        self.read(resolve(track))
+
+    def do_play(self, track: str, loops: int, fade_ms: int) -> None:
+        path = resolve(track)
+        self.queued.clear()
+        if fade_ms and self.is_busy():
+            pygame.mixer.music.fadeout(fade_ms)
+            time.sleep(fade_ms / 1000)  # newer pygame returns at once instead of waiting for the fade
+        self.start_track(path, loops, fade_ms)
+
+    def do_queue(self, track: str, loops: int) -> None:
+        path = resolve(track)
+        self.read(path)
+        self.queued.append((path, loops))
+
+    def do_next(self) -> None:
+        path, loops = self.queued.popleft()
+        self.start_track(path, loops, 0)
+
+    def do_stop(self, fade_ms: int) -> None:
+        self.queued.clear()
+        if fade_ms:
+            pygame.mixer.music.fadeout(fade_ms)
+        else:
+            pygame.mixer.music.stop()
+        self.current = None
+
+    def start_track(self, path: str, loops: int, fade_ms: int) -> None:
+        data = self.read(path)
+        with perf.timer('music load', path):
+            try:
+                self.data = io.BytesIO(data)
+                pygame.mixer.music.load(self.data)
+            except (pygame.error, TypeError):  # this pygame can't stream from memory
+                self.data = None
+                pygame.mixer.music.load(path)
+        try:
+            pygame.mixer.music.play(loops, 0.0, fade_ms)
+        except TypeError:  # no fade in before pygame 2
+            pygame.mixer.music.play(loops)
+        self.current = path
+
+
+service = MusicService()
+
+
+def prefetch(track: str) -> None:
+    service.prefetch(track)
+
+
+def play(track: str, loops: int = 0, fade_ms: int = 0) -> None:
+    service.play(track, loops, fade_ms)
+
+
+def queue(track: str, loops: int = 0) -> None:
+    service.queue(track, loops)
+
+
+def stop(fade_ms: int = 0) -> None:
+    service.stop(fade_ms)
@@ -1,40 +1,103 @@
 #!/usr/bin/python3
 # coding=utf-8
-import threading
 import math
-import time
 import pygame
+import audio
+import gameclock
 import globals
+import input
 import popup
+import scheduler
 import sprite
-import sfx
 import draw
+import entities
+from sfx import voices
 
 
 class Object:
-    def __setattr__(self, key, value):
-        object.__setattr__(self, key, value)
-        if key == 'pos':
-            object.__setattr__(self, 'x', value[0])
-            object.__setattr__(self, 'y', value[1])
-            try:
-                self.sprite.rect.center = value
-            except AttributeError:
-                pass
-        elif key == 'x':
-            object.__setattr__(self, 'pos', (value, self.pos[1]))
-            self.sprite.rect.center = self.pos
-        elif key == 'y':
-            object.__setattr__(self, 'pos', (self.pos[0], value))
-            self.sprite.rect.center = self.pos
-        elif key == 'sprite':
-            object.__setattr__(self, 'sprite', value)
-            value.rect.center = self.pos
+    """
+    A thing in a room. Its position, depth and sprite live in entities.store; the object itself only knows
+    its row there, so objects of this class and of subclasses declaring __slots__ stay small.
+    Moving it keeps the room's spatial index (space) up to date. pos is the only position an object has:
+    the store moves objects by their velocity without telling them, so the sprite's rect is not kept in step.
+    """
+    __slots__ = ('entity', 'space', '__weakref__')
 
-    def __init__(self, pos):
-        self.pos = pos
-        self.sprite = sprite.Sprite()
-        self.weight = 16384
+    def __init__(self, pos, initial_sprite: sprite.Sprite = None):
+        self.space = None
+        self.entity = entities.store.new(pos[0], pos[1], 16384, owner=self)
+        self.sprite = initial_sprite if initial_sprite is not None else sprite.Sprite()
+
+    def __del__(self):
+        try:
+            entities.store.release(self.entity)
+        except AttributeError:  # __init__ didn't get that far
+            pass
+
+    @property
+    def pos(self) -> (float, float):
+        e = self.entity
+        return entities.store.x[e], entities.store.y[e]
+
+    @pos.setter
+    def pos(self, value):
+        e = self.entity
+        entities.store.x[e], entities.store.y[e] = value[0], value[1]
+        if self.space is not None:
+            self.space.update(self)
+
+    @property
+    def x(self) -> float:
+        return entities.store.x[self.entity]
+
+    @x.setter
+    def x(self, value):
+        entities.store.x[self.entity] = value
+        if self.space is not None:
+            self.space.update(self)
+
+    @property
+    def y(self) -> float:
+        return entities.store.y[self.entity]
+
+    @y.setter
+    def y(self, value):
+        entities.store.y[self.entity] = value
+        if self.space is not None:
+            self.space.update(self)
+
+    @property
+    def velocity(self) -> (float, float):
+        """
+        Pixels a frame the object moves by on its own.
+        """
+        e = self.entity
+        return entities.store.vx[e], entities.store.vy[e]
+
+    @velocity.setter
+    def velocity(self, value):
+        entities.store.set_velocity(self.entity, value[0], value[1])
+
+    @property
+    def weight(self) -> int:
+        """
+        The layer the object is drawn on; see draw.get_layer.
+        """
+        return entities.store.depth[self.entity]
+
+    @weight.setter
+    def weight(self, value):
+        entities.store.depth[self.entity] = value
+
+    @property
+    def sprite(self) -> sprite.Sprite:
+        return entities.store.sprite[self.entity]
+
+    @sprite.setter
+    def sprite(self, value):
+        entities.store.sprite[self.entity] = value
+        if self.space is not None:
+            self.space.update(self)
 
     def interact(self, chara):
         pass
@@ -42,8 +105,32 @@ class Object:
     def redraw(self):
         pass
 
+    def behave(self, work, name: str = None, every: int = 1, delay: int = 0) -> scheduler.Task:
+        """
+        Run a behaviour of this object on the game's scheduler: a step function called every frame, or a
+        generator that yields frames or a condition to wait for (see scheduler.Task). It stops when the object
+        is disposed of.
+        """
+        name = name or '{} of {}'.format(getattr(work, '__name__', 'behaviour'), self.__class__.__name__)
+        return scheduler.add(work, name, owner=self, every=every, delay=delay)
+
+    def dispose(self):
+        """
+        Called when the object's room is disposed of: stop its behaviours.
+        """
+        scheduler.scheduler.cancel(self)
+
+    def bounds(self) -> pygame.Rect:
+        """
+        The area the object is drawn in; what the room's spatial index knows it by.
+        """
+        w, h = self.sprite.image[0].get_size()
+        return pygame.Rect(int(self.pos[0]), int(self.pos[1]), max(w, 1), max(h, 1))
+
 
 class RaiseException(Object):
+    __slots__ = ()
+
     def __init__(self, pos):
         super(RaiseException, self).__init__(pos)
         self.sprite = sprite.Sprite.get_sprite("spr_mysteryman", scale_value=2, run=False)
@@ -53,36 +140,54 @@ class RaiseException(Object):
 
 
 class SAVEPoint(Object):  # TODO: add additional text before showing popup.
+    __slots__ = ('popup', 'task', 'input')
+
     def __init__(self, pos):
         super(SAVEPoint, self).__init__(pos)
         self.sprite = sprite.Sprite.get_sprite("spr_savepoint", scale_value=2, delay=15)
         self.popup = None
-        self.thread = None
+        self.task = None
+        self.input = input.Consumer('SAVE popup')
 
     def popup_worker(self):
-        globals.event_lock = True
-        self.popup = popup.SAVEPopup()
-        while not self.popup.finished:
-            for i in pygame.event.get():
-                if i.type == pygame.KEYDOWN:
-                    self.popup.on_button(i.key)
-        globals.event_lock = False
+        try:
+            self.popup = popup.SAVEPopup()
+            while not self.popup.finished:
+                for i in self.input.get():
+                    if i.type == pygame.KEYDOWN:
+                        self.popup.on_button(i.key)
+                yield
+        finally:  # also when the task is cancelled, or the popup fails
+            self.close_popup()
 
+    def close_popup(self):
+        input.dispatcher.pop_focus(self.input)
+        if self.popup is not None and not self.popup.finished:
+            self.popup.layer.destroy()
+            self.popup.finished = True
 
     def interact(self, chara):
-        sfx.get_sound(0x29fb).play()
-        self.thread = threading.Thread(target=self.popup_worker, daemon=True,
-                                       name='popup worker for {}'.format(self.__class__.__name__))
-        self.thread.start()
+        if self.task is not None and not (self.task.finished or self.task.cancelled):
+            return
+        audio.play('snd_power', voices.PRIORITY_UI)
+        input.dispatcher.push_focus(self.input, input.FOCUS_POPUP)
+        self.task = self.behave(self.popup_worker())
+
+    def dispose(self):
+        super().dispose()
+        self.close_popup()  # a task cancelled before it first ran never reaches its finally
 
 
 class TestTextBoxObject(Object):
+    __slots__ = ('popup', 'task', 'input')
+
     def __init__(self, pos):
         super().__init__(pos)
         self.sprite = sprite.Sprite.get_sprite('spr_charad', 2, False)
         self.popup = None
-        self.thread = None
+        self.task = None
         self.weight = 1024
+        self.input = input.Consumer('text box')  # holds focus between the typers, so keys don't leak to the room
 
     def draw_recvd_surface(self):
         l = draw.get_layer(self.weight)
@@ -92,33 +197,62 @@ class TestTextBoxObject(Object):
         l.flip()
 
     def popup_worker(self):
-        globals.event_lock = True
-        self.popup = popup.TextPopup(['Hello World!^1/'], self.draw_recvd_surface)
-        self.popup.start()
-        while not self.popup.finished:
-            self.popup.draw()
-        globals.event_lock = False
-        draw.get_layer(self.weight).destroy()
+        try:
+            self.popup = popup.TextPopup(['Hello World!^1/'], self.draw_recvd_surface)
+            self.popup.begin()
+            while not self.popup.tick():
+                for i in self.input.get():
+                    if i.type == pygame.KEYDOWN:
+                        self.popup.on_key(i.key)
+                yield
+        finally:  # also when the task is cancelled, or the popup fails
+            self.close_popup()
+
+    def close_popup(self):
+        input.dispatcher.pop_focus(self.input)
+        self.input.get()
+        if self.popup is not None:
+            draw.get_layer(self.weight).destroy()
+            self.popup = None
 
     def interact(self, chara):
-        self.thread = threading.Thread(target=self.popup_worker, daemon=True,
-                                       name='popup worker for {}'.format(self.__class__.__name__))
-        self.thread.start()
+        if self.task is not None and not (self.task.finished or self.task.cancelled):
+            return
+        input.dispatcher.push_focus(self.input, input.FOCUS_POPUP)
+        self.task = self.behave(self.popup_worker())
+
+    def dispose(self):
+        super().dispose()
+        self.close_popup()  # a task cancelled before it first ran never reaches its finally
 
 
 class TestMovingObject(Object):
+    __slots__ = ('centerpos', 'motion')
+
     def __init__(self, pos):
         super(TestMovingObject, self).__init__(pos)
         self.centerpos = pos
-        self.run = True
-        self.motion = threading.Thread(target=self.motionloop, name='motion of {}'.format(str(self.__class__.__name__)),
-                                       daemon=True)
-        self.motion.start()
         self.sprite = sprite.Sprite.get_sprite("spr_tobdogl", scale_value=4)
         self.sprite.delay = 30
+        self.motion = self.behave(self.move)
+
+    def move(self):
+        t = gameclock.clock.frame / gameclock.clock.fps
+        self.pos = (
+            self.centerpos[0] + int(100 * math.sin(t)),
+            self.centerpos[1] + int(100 * math.cos(t)))
+
+
+class Instance(Object):
+    """
+    An object instance placed by a decompiled room. It only shows its sprite; data is the room's record of it.
+    """
+    __slots__ = ('data',)
 
-    def motionloop(self):
-        while self.run:
-            self.pos = (
-                self.centerpos[0] + int(100 * math.sin(time.time())),
-                self.centerpos[1] + int(100 * math.cos(time.time())))
+    def __init__(self, pos, data, frames: [(pygame.Surface, (float, float))]):
+        s = sprite.Sprite()
+        s.frames = frames
+        s.image = frames[0]
+        s.delay = 15
+        super().__init__(pos, s)
+        self.data = data
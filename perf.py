@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+# coding=utf-8
+import contextlib
+import threading
+import time
+
+
+class Stats:
+    """
+    Timings of expensive, occasional operations such as asset loads, grouped by category and name.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}  # category -> {name: [count, total seconds, slowest seconds]}
+
+    def record(self, category: str, name: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.timings.setdefault(category, {}).setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextlib.contextmanager
+    def timer(self, category: str, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, name, time.perf_counter() - started_at)
+
+    def total(self, category: str) -> (int, float):
+        """
+        :return: 2-tuple of how many operations were timed in this category and how many seconds they took.
+        """
+        with self.lock:
+            entries = list(self.timings.get(category, {}).values())
+        return sum(i[0] for i in entries), sum(i[1] for i in entries)
+
+    def report(self) -> str:
+        lines = []
+        with self.lock:
+            for category in sorted(self.timings):
+                entries = self.timings[category]
+                lines.append('{}: {} ops, {:.1f} ms'.format(category, sum(i[0] for i in entries.values()),
+                                                           sum(i[1] for i in entries.values()) * 1000))
+                for name, (count, total, slowest) in sorted(entries.items(), key=lambda i: -i[1][1]):
+                    lines.append('  {}: {} x, {:.1f} ms total, {:.1f} ms slowest'.format(name, count, total * 1000,
+                                                                                       slowest * 1000))
+        return '\n'.join(lines)
+
+
+stats = Stats()
+timer = stats.timer
@@ -4,12 +4,14 @@ import threading
 
 import pygame
 
+import audio
 import draw
+import gameclock
 import globals
 import sprite
 import font
 import typer
-import sfx
+from sfx import voices
 
 
 class Popup:
@@ -45,7 +47,7 @@ class SAVEPopup(Popup):
         self.text_save = font.render('Save')
         self.text_return = font.render('Return')
         self.heart = sprite.Sprite.get_sprite('spr_heart')
-        sfx.get_sound(0x29fb).play()
+        audio.play('snd_power', voices.PRIORITY_UI)
         self.update()
 
     def update(self):
@@ -76,8 +78,8 @@ class SAVEPopup(Popup):
                 self.finished = True
             else:
                 if not self.saved:
-                    sfx.get_sound(0x29a7).play()
-                    globals.chara.save('')
+                    audio.play('snd_save', voices.PRIORITY_UI)
+                    globals.chara.save('', background=True)
                     self.text_name = font.render(globals.chara.charname, color=pygame.Color(255, 255, 0, 255))
                     self.text_lv = font.render('LV {}'.format(str(globals.chara.lv)),
                                                color=pygame.Color(255, 255, 0, 255))
@@ -120,7 +122,27 @@ class TextPopup(Popup):
         self.skips, self.choice = self.metatyper.run()
         self.finished = True
 
+    def begin(self):
+        """
+        Get ready to be driven by tick and on_key from the main loop, instead of typing on a thread.
+        """
+        self.create_metatyper()
+        self.finished = False
+
+    def tick(self) -> bool:
+        """
+        Type for one frame. :return: True once all the text is done.
+        """
+        if self.metatyper.tick():
+            self.skips, self.choice = self.metatyper.skipcount, self.metatyper.choice
+            self.finished = True
+        return self.finished
+
+    def on_key(self, key: int):
+        self.metatyper.on_key(key)
+
     def start(self):
         self.create_metatyper()
-        self.thread = threading.Thread(target=self.run, name='thread for TextPopup', daemon=True)
+        self.thread = threading.Thread(target=gameclock.clock.following(self.run), name='thread for TextPopup',
+                                       daemon=True)
         self.thread.start()
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+Recording and replaying of input, for repeatable test and benchmark runs.
+
+Record while playing:  python3 main.py --record run.rpl
+Replay headless:       python3 replay.py run.rpl [--realtime]
+
+A replay runs the game clock in lockstep (see gameclock.GameClock): every tick waits for the threads
+running room scripts and typers, and they count their waits in frames, so a recording gives the same
+outcome on every replay, however fast it goes. A replay where a thread held up a frame for longer than
+gameclock.LOCKSTEP_TIMEOUT fails, as it may have drifted.
+"""
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import traceback
+import pygame
+
+import gameclock
+import input
+
+MAGIC = b'UTRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHQ')  # magic, version, random seed
+RECORD = struct.Struct('<IIBIH')  # frame, milliseconds since start, event kind, key, modifiers
+KINDS = [pygame.KEYDOWN, pygame.KEYUP, pygame.QUIT]
+SAVE_FILES = ['file0', 'undertale.ini', 'system_information_962', 'system_information_963']
+
+
+class Recorder:
+    """
+    Writes every key and quit event the dispatcher sees to a file, stamped with the game frame and time.
+    """
+
+    def __init__(self, path: str, seed: int = None):
+        self.path = path
+        self.seed = int(time.time()) if seed is None else seed
+        self.file = None
+        self.started_at = 0.0
+        self.count = 0
+
+    def start(self) -> None:
+        random.seed(self.seed)
+        self.file = open(self.path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.seed))
+        self.started_at = time.time()
+        input.dispatcher.taps.append(self.record)
+
+    def record(self, event: pygame.event.EventType) -> None:
+        if event.type not in KINDS or self.file is None:
+            return
+        self.file.write(RECORD.pack(gameclock.clock.frame, int((time.time() - self.started_at) * 1000),
+                                    KINDS.index(event.type), getattr(event, 'key', 0), getattr(event, 'mod', 0)))
+        self.count += 1
+
+    def stop(self) -> None:
+        if self.record in input.dispatcher.taps:
+            input.dispatcher.taps.remove(self.record)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Replayer:
+    """
+    Feeds a recording back through the dispatcher in place of the real event queue, each event on the
+    frame it was recorded on. Once the recording runs out, the game is stopped tail frames later.
+    """
+
+    def __init__(self, path: str, tail: int = 30):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, self.seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} recording'.format(path, VERSION))
+        self.records = [RECORD.unpack_from(data, i) for i in range(HEADER.size, len(data), RECORD.size)]
+        self.position = 0
+        self.tail = tail
+        self.finished = False
+
+    def start(self) -> None:
+        random.seed(self.seed)
+        input.dispatcher.source = self.source
+
+    def stop(self) -> None:
+        input.dispatcher.source = pygame.event.get
+
+    def source(self) -> [pygame.event.EventType]:
+        pygame.event.get()  # keep the real queue drained; its contents don't matter during a replay
+        frame = gameclock.clock.frame
+        out = []
+        while self.position < len(self.records) and self.records[self.position][0] <= frame:
+            _, _, kind, key, mod = self.records[self.position]
+            if KINDS[kind] == pygame.QUIT:
+                out.append(pygame.event.Event(pygame.QUIT))
+            else:
+                out.append(pygame.event.Event(KINDS[kind], key=key, mod=mod, unicode='', scancode=0))
+            self.position += 1
+        last = self.records[-1][0] if self.records else 0
+        if self.position >= len(self.records) and frame >= last + self.tail:
+            self.finished = True
+            import globals
+            globals.running = False
+        return out
+
+
+def run(path: str, realtime: bool = False) -> int:
+    """
+    Play a recording through the game without a window, as fast as possible unless realtime is set.
+    The game SAVEs as it goes, so it runs on copies of the SAVE files in a directory of its own; the
+    player's are never touched. Print how long it took and return a process exit code.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.init()
+    import globals
+    import main
+    globals.display = pygame.display.set_mode((globals.width, globals.height))
+    gameclock.clock.realtime = realtime
+    gameclock.clock.lockstep = True
+    replayer = Replayer(path)
+    save_dir = tempfile.mkdtemp(prefix='replay-')
+    for i in SAVE_FILES:
+        if os.path.exists(os.path.join(globals.save_dir, i)):
+            shutil.copy(os.path.join(globals.save_dir, i), save_dir)
+    globals.save_dir = save_dir
+    replayer.start()
+    started_at = time.time()
+    try:
+        main.init()
+        main.maincycle()
+    except SystemExit:
+        pass
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        globals.running = False
+        replayer.stop()
+        import config
+        config.flush_all(True)  # before its directory goes
+        shutil.rmtree(save_dir, ignore_errors=True)
+    elapsed = time.time() - started_at
+    print('Replayed {} events over {} frames in {:.2f}s ({:.1f} frames/s, {:.1f}x real time)'.format(
+        replayer.position, gameclock.clock.frame, elapsed, gameclock.clock.frame / max(elapsed, 0.001),
+        gameclock.clock.frame / gameclock.clock.fps / max(elapsed, 0.001)))
+    if gameclock.clock.stalls:
+        print('Not repeatable: {} frames went ahead without a thread that was late'.format(
+            len(gameclock.clock.stalls)))
+        return 1
+    return 0 if replayer.finished else 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: replay.py RECORDING [--realtime]')
+        sys.exit(2)
+    code = run(sys.argv[1], '--realtime' in sys.argv)
+    sys.stdout.flush()
+    os._exit(code)  # room threads from the replayed session may still be blocked; don't wait for them
@@ -1,19 +1,38 @@
 #!/usr/bin/python3
 # coding=utf-8
 import math
-import threading
 
 import pygame
+import audio
+import collision
+import gameclock
 import globals
 import draw
+import entities
+import input
+import music
+import scheduler
+import sfx
+import spatial
+from rooms import transition
+
+INTERACT_DISTANCE = 50  # pixels from Frisk within which the accept key reaches an object
+CHARA_SHAPE = 'spr_maincharad'  # the walk sprites share its collision box: the feet
+
+# the life of a room: built, entered (on_enter runs), active (updating every frame), exited, disposed
+CONSTRUCTED, ENTERED, ACTIVE, EXITED, DISPOSED = 'constructed', 'entered', 'active', 'exited', 'disposed'
 
 
 class Room:
     def __setattr__(self, key, value):
         super().__setattr__(key, value)
-        if key == 'background':
+        if key == 'objects':
+            super().__setattr__('space', spatial.SpatialHash(value))
+        elif transition.staging():
+            return  # being built in the background; show() puts it on screen
+        elif key == 'background':
             try:
-                pos = self.bg_pan
+                pos = self.background_pos()
             except AttributeError:
                 pos = (0, 0)
             self.background_layer.surface.blit(value, pos)
@@ -34,42 +53,97 @@ class Room:
         self.background_layer = draw.get_layer(65536)
         self.background = pygame.Surface((globals.width, globals.height))
         self.bg_pan = (0, 0)
+        self.size = (globals.width, globals.height)  # of the room, in screen pixels
+        self.camera = (0, 0)  # where the screen's top left corner is in the room
+        self.drawn_camera = (0, 0)  # the camera the objects on screen were drawn with
         self.objects = []
-        self.song = None
-        self.run_update = True
+        self.solids = collision.Solids()  # what Frisk can't walk through
+        self.song = None  # name of the music asset
+        self.sounds = []  # sounds (by name or sfx id) to load when entering, and keep loaded while here
+        self.state = CONSTRUCTED
+        self.warmed = False
         self.entered = False
         self.exited = False
-        self.update_thread = threading.Thread(target=self.update_loop,
-                                              name='update loop for {}'.format(self.__class__.__name__), daemon=True)
-        self.update_thread.start()
         self.c = 0
-        self.clock = pygame.time.Clock()
 
-    def __del__(self):
-        self.run_update = False
+    def background_pos(self) -> (int, int):
+        return self.bg_pan[0] - self.camera[0], self.bg_pan[1] - self.camera[1]
+
+    def look_at(self, pos: (float, float)) -> None:
+        """
+        Move the camera so pos is in the middle of the screen, as far as the room's edges allow.
+        """
+        x = min(max(int(pos[0]) - globals.width // 2, 0), max(self.size[0] - globals.width, 0))
+        y = min(max(int(pos[1]) - globals.height // 2, 0), max(self.size[1] - globals.height, 0))
+        if (x, y) != self.camera:
+            self.camera = (x, y)
+            if not transition.staging():  # else show() draws it
+                self.background_layer.surface.blit(self.background, self.background_pos())
+                self.background_layer.flip()
 
     def draw(self):
+        cx, cy = self.camera
+        if self.camera != self.drawn_camera:  # everything moved on screen; don't leave the old picture behind
+            for i in set(i.weight for i in self.objects):
+                draw.get_layer(i).clear()
+            self.drawn_camera = self.camera
         for i in self.objects:
             i.redraw()
             i.sprite.update()
             layer = draw.get_layer(i.weight)
-            layer.surface.blit(i.sprite.image[0], i.pos)
+            layer.surface.blit(i.sprite.image[0], (i.pos[0] - cx, i.pos[1] - cy))
             layer.flip()
         self.c += 1
-        if self.c >= 30:
+        if self.c >= gameclock.clock.fps:
             self.c = 0
             globals.time += 1
-        pygame.event.pump()
-        self.clock.tick(30)
+        input.dispatcher.pump()
+        entities.store.step()
+        scheduler.scheduler.tick()
+        gameclock.clock.tick()
+        transition.manager.tick()  # rooms are swapped between frames
 
-    def update_loop(self):
+    def update(self):
+        """
+        Called once a frame while the room is active, as a scheduler task. Return False to stop being called.
+        """
         pass
 
+    def warm(self):
+        """
+        Load what the room needs, so entering it doesn't wait for the disk. Transitions do this while building it.
+        """
+        if self.warmed:
+            return
+        self.warmed = True
+        try:
+            sfx.preload(audio.sound_ids(self.sounds))
+        except EnvironmentError:
+            pass
+        if self.song is not None:
+            music.prefetch(self.song)
+
+    def show(self):
+        """
+        Put the room's background on screen, and clear what the previous room left on the shared layers.
+        """
+        self.background_layer.clear()
+        self.background_layer.surface.blit(self.background, self.background_pos())
+        self.background_layer.flip()
+        for i in set(i.weight for i in globals.room.objects) if globals.room is not None else ():
+            draw.get_layer(i).clear()
+            draw.get_layer(i).flip()
+
     def on_enter(self):
         if self.entered:
             return False
         else:
             self.entered = True
+            self.state = ENTERED
+            self.warm()
+            if type(self).update is not Room.update:
+                scheduler.add(self.update, 'update of {}'.format(self.__class__.__name__), owner=self)
+            self.state = ACTIVE
             return True
 
     def on_exit(self):
@@ -77,8 +151,25 @@ class Room:
             return False
         else:
             self.exited = True
+            scheduler.scheduler.cancel(self)
+            self.state = EXITED
             return True
 
+    def dispose(self):
+        """
+        Let go of the room for good: stop everything it scheduled, and drop its objects.
+        """
+        if self.state == DISPOSED:
+            return
+        if self.entered:
+            self.on_exit()
+        scheduler.scheduler.cancel(self)
+        for i in self.objects:
+            i.dispose()
+        self.objects = []
+        self.solids = collision.Solids()
+        self.state = DISPOSED
+
 
 class RoomWalkable(Room):
     def __init__(self):
@@ -86,8 +177,10 @@ class RoomWalkable(Room):
         self.clock = pygame.time.Clock()
         self.chara = globals.chara
         self.chara_layer = draw.get_layer(128)
+        self.input = input.Consumer('room {}'.format(self.__class__.__name__))
         self.walk_animate_init()
         self.walk_tick = 0
+        self.follow = True  # whether the camera follows Frisk
         self.c = 0
 
     def walk_animate_init(self):  # TODO: delegate to appropriate place.
@@ -105,6 +198,16 @@ class RoomWalkable(Room):
         self.right_cycle = [scale(pygame.image.load("sprites/spr_maincharar_" + str(i) + ".png"), scale_factor) for i in
                             range(2)]
 
+    def on_enter(self):
+        input.dispatcher.subscribe(self.input)
+        input.dispatcher.push_focus(self.input, input.FOCUS_ROOM)
+        return super().on_enter()
+
+    def on_exit(self):
+        input.dispatcher.pop_focus(self.input)
+        input.dispatcher.unsubscribe(self.input)
+        return super().on_exit()
+
     def walk_animate_loop(self):
         chara = self.chara
         chara.sprite = [self.upcycle, self.right_cycle, self.down_cycle, self.left_cycle][chara.dir][0]
@@ -115,46 +218,54 @@ class RoomWalkable(Room):
                     chara.sprite = i
 
     def draw(self):
-        super().draw()
         chara = self.chara
+        if self.follow and chara.sprite is not None:
+            w, h = chara.sprite.get_size()
+            self.look_at((chara.pos[0] + w / 2, chara.pos[1] + h / 2))
+        super().draw()
         self.walk_animate_loop()
         self.chara_layer.clear()
-        self.chara_layer.surface.blit(chara.sprite, (int(chara.pos[0]), int(chara.pos[1])))
+        self.chara_layer.surface.blit(chara.sprite, (int(chara.pos[0]) - self.camera[0],
+                                                     int(chara.pos[1]) - self.camera[1]))
         self.chara_layer.flip()
 
-        if not globals.event_lock:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+        for event in self.input.get():  # key events only arrive here while the room has focus
+            if event.type == pygame.QUIT:
+                globals.quit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
                     globals.quit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        globals.quit()
-                    if event.key in globals.accept:
-                        for i in self.objects:
-                            if int(math.fabs(i.x - chara.x) * 2) + int(
-                                    math.fabs(
-                                        i.y - chara.y) * 2) < 100:  # TODO: decrease dubiosity of distance formula.
-                                i.interact(chara)
-                                break
-            keys_pressed = pygame.key.get_pressed()
-            chara.moving = False
-            if keys_pressed[globals.left]:
-                chara.dir = 3
-                chara.moving = True
-                chara.pos = (chara.pos[0] - chara.movespeed, chara.pos[1])
-            if keys_pressed[globals.right]:
-                chara.dir = 1
-                chara.moving = True
-                chara.pos = (chara.pos[0] + chara.movespeed, chara.pos[1])
-            if keys_pressed[globals.up]:
-                chara.dir = 0
-                chara.moving = True
-                chara.pos = (chara.pos[0], chara.pos[1] - chara.movespeed)
-            if keys_pressed[globals.down]:
-                chara.dir = 2
-                chara.moving = True
-                chara.pos = (chara.pos[0], chara.pos[1] + chara.movespeed)
-
-        self.clock.tick(30)
-        if not int(chara.pos[0]) in range(646) or not int(chara.pos[1]) in range(505):
-            raise NotImplementedError("chara left screen area", 1)
+                if event.key in globals.accept:
+                    for i in self.space.query_radius(chara.pos, INTERACT_DISTANCE):  # nearest first
+                        if int(math.fabs(i.x - chara.x) * 2) + int(
+                                math.fabs(
+                                    i.y - chara.y) * 2) < 100:  # TODO: decrease dubiosity of distance formula.
+                            i.interact(chara)
+                            break
+        if input.dispatcher.has_focus(self.input):
+            keys_pressed = input.dispatcher.is_pressed
+            x, y = chara.pos
+            direction = None
+            if keys_pressed(globals.left):
+                direction = 3
+                x -= chara.movespeed
+            if keys_pressed(globals.right):
+                direction = 1
+                x += chara.movespeed
+            if keys_pressed(globals.up):
+                direction = 0
+                y -= chara.movespeed
+            if keys_pressed(globals.down):
+                direction = 2
+                y += chara.movespeed
+            chara.moving = direction is not None
+            if chara.moving:  # one write a frame, so the journal sees one change
+                dx, dy = self.solids.move(collision.place(CHARA_SHAPE, chara.pos, 2, 2),
+                                          x - chara.pos[0], y - chara.pos[1])
+                chara.dir = direction
+                w, h = chara.sprite.get_size()  # Frisk stays in the room, whole
+                chara.pos = (min(max(chara.pos[0] + dx, 0), max(self.size[0] - w, 0)),
+                             min(max(chara.pos[1] + dy, 0), max(self.size[1] - h, 0)))
+
+        if gameclock.clock.realtime:
+            self.clock.tick(30)
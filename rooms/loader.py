@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+# coding=utf-8
+import collections
+import json
+import os
+import re
+import threading
+
+import pygame
+import collision
+import datacache
+import globals
+import objects
+import sprite
+from rooms.common import RoomWalkable
+
+ROOM_DIR = 'decompilation/room/'
+BG_DIR = 'decompilation/bg/'
+OBJECT_DIR = 'decompilation/object/'
+VERSION = 1
+
+RoomData = collections.namedtuple('RoomData', ['id', 'name', 'size', 'colour', 'views', 'backgrounds', 'instances',
+                                               'tiles'])
+View = collections.namedtuple('View', ['view', 'port', 'follow'])  # view and port are (x, y, width, height)
+Background = collections.namedtuple('Background', ['bg', 'x', 'y', 'tilex', 'tiley', 'foreground'])
+Instance = collections.namedtuple('Instance', ['obj', 'x', 'y', 'scalex', 'scaley', 'instanceid', 'sprite',
+                                               'visible', 'parents'])
+Tile = collections.namedtuple('Tile', ['bg', 'x', 'y', 'srcx', 'srcy', 'width', 'height', 'depth'])
+
+_FIRST_INSTANCE = re.compile(rb'"instanceid"\s*:\s*(\d+)')
+
+
+def build_index() -> {str: int}:
+    """
+    Number the rooms the way the game does. The export doesn't keep the room order, but GameMaker hands out
+    instance ids room by room in that order, so sorting rooms by their first instance id recovers it.
+    """
+    first = []
+    for i in os.listdir(ROOM_DIR):
+        if i.endswith('.json'):
+            with open(ROOM_DIR + i, 'rb') as f:
+                m = _FIRST_INSTANCE.search(f.read())
+            first.append((int(m.group(1)) if m else float('inf'), i[:-len('.json')]))
+    return {name: number for number, (_, name) in enumerate(sorted(first))}
+
+
+def _rect(d: dict) -> (int, int, int, int):
+    return d['x'], d['y'], d['width'], d['height']
+
+
+def _colour(gm_colour: str) -> (int, int, int):
+    value = int(gm_colour[1:], 16)  # GameMaker keeps colours as 0xAABBGGRR
+    return value & 0xFF, (value >> 8) & 0xFF, (value >> 16) & 0xFF
+
+
+def _object_info(name: str, known: dict) -> (str, bool, tuple):
+    """
+    :return: 3-tuple of an object's sprite name, whether it is visible, and the names of its ancestors.
+    """
+    if name not in known:
+        try:
+            with open(OBJECT_DIR + name + '.json') as f:
+                data = json.load(f)
+        except OSError:
+            data = {}
+        parent = data.get('parent', None)
+        known[name] = None  # guards against a parent loop
+        parents = (parent,) + _object_info(parent, known)[2] if parent else ()
+        known[name] = (data.get('sprite', None), data.get('visible', False), parents)
+    return known[name] or (None, False, ())
+
+
+def read_room(name: str, number: int) -> RoomData:
+    with open(ROOM_DIR + name + '.json') as f:
+        data = json.load(f)
+    known = {}
+    instances = []
+    for i in data['objs']:
+        sprite_name, visible, parents = _object_info(i['obj'], known)
+        instances.append(Instance(i['obj'], i['pos']['x'], i['pos']['y'], i['scale']['x'], i['scale']['y'],
+                                  i['instanceid'], sprite_name, visible, parents))
+    return RoomData(number, name, (data['size']['width'], data['size']['height']),
+                    _colour(data['colour']) if data['drawbgcol'] else None,
+                    [View(_rect(i['view']), _rect(i['port']), i.get('obj', None)) for i in data['views'] if
+                     i['enabled']],
+                    [Background(i['bg'], i['pos']['x'], i['pos']['y'], i['tilex'], i['tiley'], i['foreground'])
+                     for i in data['bgs'] if i['enabled'] and 'bg' in i],
+                    instances,
+                    [Tile(i['bg'], i['pos']['x'], i['pos']['y'], i['sourcepos']['x'], i['sourcepos']['y'],
+                          i['size']['width'], i['size']['height'], i['tiledepth']) for i in data['tiles']])
+
+
+class Loader:
+    """
+    Room data by number or name. The room numbering is worked out once and cached; each room's JSON is
+    parsed the first time it is needed and kept in a preparsed cache file, so after that loading a room
+    is reading one small pickle.
+    """
+
+    def __init__(self):
+        self.by_name = None
+        self.by_number = None
+        self.lock = threading.Lock()
+
+    def index(self) -> None:
+        with self.lock:
+            if self.by_name is None:
+                by_name = datacache.load('room_index', [ROOM_DIR], build_index, VERSION)
+                self.by_number = {v: k for k, v in by_name.items()}
+                self.by_name = by_name
+
+    def name(self, room) -> str:
+        if self.by_name is None:
+            self.index()
+        if isinstance(room, str):
+            if room not in self.by_name:
+                raise KeyError('no room named {}'.format(room))
+            return room
+        return self.by_number[int(room)]
+
+    def number(self, name: str) -> int:
+        if self.by_name is None:
+            self.index()
+        return self.by_name[name]
+
+    def get(self, room) -> RoomData:
+        name = self.name(room)
+        number = self.by_name[name]
+        return datacache.load('room_' + name, [ROOM_DIR + name + '.json', OBJECT_DIR], lambda: read_room(name, number),
+                              VERSION)
+
+
+loader = Loader()
+
+
+class BackgroundTextures(dict):
+    def __missing__(self, name):
+        with open(BG_DIR + name + '.json') as f:
+            surface = sprite.textures[json.load(f)['texture']]
+        self[name] = surface
+        return surface
+
+
+bg_textures = BackgroundTextures()
+
+
+class DecompiledRoom(RoomWalkable):
+    """
+    A room built from the decompiled room data: its colour, backgrounds and tiles are drawn once into the
+    background, scaled from the first view to its port, and its visible instances become objects. The
+    screen shows the first view: it follows Frisk if the view follows obj_mainchara, else it stays put.
+    Instances that aren't drawn, such as walls, are still listed in self.instances; solid ones go into
+    self.solids.
+    """
+
+    def __init__(self, data: RoomData):
+        RoomWalkable.__init__(self)
+        self.data = data
+        self.id = data.id
+        self.name = data.name
+        self.instances = data.instances
+        view = data.views[0] if data.views else View((0, 0) + data.size, (0, 0) + data.size, None)
+        self.scale = view.port[2] / view.view[2]
+        self.follow = view.follow == 'obj_mainchara'
+        self.background = self.render()
+        self.size = self.background.get_size()
+        self.look_at((int((view.view[0] + view.view[2] / 2) * self.scale),
+                      int((view.view[1] + view.view[3] / 2) * self.scale)))
+        self.objects = self.make_objects()
+        self.solids = collision.Solids(self.make_solids())
+
+    def render(self) -> pygame.Surface:
+        data = self.data
+        surface = pygame.Surface(data.size)
+        if data.colour is not None:
+            surface.fill(data.colour)
+        for i in data.backgrounds:
+            if not i.foreground:
+                self.blit_background(surface, i)
+        for i in sorted(data.tiles, key=lambda t: -t.depth):  # deeper tiles first
+            source = bg_textures[i.bg]
+            surface.blit(source, (i.x, i.y), pygame.Rect(i.srcx, i.srcy, i.width, i.height))
+        for i in data.backgrounds:
+            if i.foreground:
+                self.blit_background(surface, i)
+        if self.scale != 1:
+            surface = pygame.transform.scale(surface, (int(data.size[0] * self.scale),
+                                                       int(data.size[1] * self.scale)))
+        return surface
+
+    def blit_background(self, surface: pygame.Surface, bg: Background) -> None:
+        source = bg_textures[bg.bg]
+        w, h = source.get_size()
+        xs = range(bg.x % w - w if bg.tilex else bg.x, surface.get_width() if bg.tilex else bg.x + 1, w)
+        ys = range(bg.y % h - h if bg.tiley else bg.y, surface.get_height() if bg.tiley else bg.y + 1, h)
+        for x in xs:
+            for y in ys:
+                surface.blit(source, (x, y))
+
+    def frames(self, name: str, scalex: float, scaley: float) -> [(pygame.Surface, (float, float))]:
+        """
+        The frames of a sprite scaled for this room and an instance's own scale; a negative scale mirrors.
+        """
+        out = []
+        for surface, (x, y) in sprite.Sprite.get_sprite(name).frames:
+            w, h = surface.get_size()
+            sx, sy = self.scale * scalex, self.scale * scaley
+            surface = pygame.transform.scale(surface, (int(w * abs(sx)), int(h * abs(sy))))
+            if sx < 0 or sy < 0:
+                surface = pygame.transform.flip(surface, sx < 0, sy < 0)
+            out.append((surface, (x * sx if sx > 0 else (w - x) * -sx, y * sy if sy > 0 else (h - y) * -sy)))
+        return out
+
+    def make_objects(self) -> [objects.Object]:
+        out = []
+        frames = {}  # instances of one object share its frames
+        for i in self.instances:
+            if not i.visible or i.sprite is None:
+                continue
+            key = (i.sprite, i.scalex, i.scaley)
+            if key not in frames:
+                try:
+                    frames[key] = self.frames(*key)
+                except (OSError, KeyError, IndexError, pygame.error):
+                    frames[key] = None
+            if frames[key] is not None:
+                origin = frames[key][0][1]
+                pos = (int(i.x * self.scale - origin[0]), int(i.y * self.scale - origin[1]))
+                out.append(objects.Instance(pos, i, frames[key]))
+        return out
+
+    def make_solids(self) -> [collision.Collider]:
+        out = []
+        for i in self.instances:
+            if i.sprite is not None and collision.is_solid(i):
+                try:
+                    out.append(collision.place(i.sprite, (i.x * self.scale, i.y * self.scale),
+                                               i.scalex * self.scale, i.scaley * self.scale, i))
+                except (OSError, KeyError):
+                    pass
+        return out
+
+    def on_enter(self):
+        for i in self.instances:
+            if i.obj == 'obj_mainchara':
+                globals.chara.pos = (int(i.x * self.scale), int(i.y * self.scale))
+        return super().on_enter()
@@ -9,8 +9,10 @@ import pygame
 
 import draw
 import font
+import gameclock
 import input
 import globals
+import music
 import rooms
 import sprite
 import typer
@@ -46,10 +48,9 @@ class room_introstory(Menu):
     def on_enter(self):
         if super().on_enter():
             pygame.display.set_caption('UNDERTALE')
-            pygame.mixer.music.load("mus/mus_story_91.ogg")
-            pygame.mixer.music.play()
+            music.play('mus_story_91')
             self.show_intro()
-            globals.chara.go_to_room(rooms.Room_TEST1())
+            globals.chara.go_to_room(rooms.Room_TEST1)
 
     def show_intro(self):
         self.text_layer.show()
@@ -66,6 +67,7 @@ class room_introstory(Menu):
                 t = typer.Typer()
                 t.text = i
                 t.surface = s
+                t.box_width = s.get_width()
                 t.to_on_run_loop = self.text_layer
                 t.on_run_loop = update
                 t.run()
@@ -73,6 +75,7 @@ class room_introstory(Menu):
 
     def on_exit(self):
         self.text_layer.destroy()
+        return super().on_exit()
 
 
 class room_introimage(Menu):
@@ -88,14 +91,14 @@ class room_introimage(Menu):
             globals.chara.go_to_room(rooms.room_introstory)
 
     def show_image(self):
-        pygame.mixer.music.load("mus/mus_intronoise.ogg")
+        music.play('mus_intronoise')
+        music.prefetch('mus_story_91')
         i = pygame.image.load("sprites/splash.png")
         i = sprite.scale(i, 2)
         self.background_layer.surface.blit(i, (
             globals.screen_rect.right / 2 - i.get_width() / 2, globals.screen_rect.bottom / 2 - i.get_height() / 2))
         self.background_layer.flip()
         self.text_layer.clear()
-        pygame.mixer.music.play()
         if input.await_keypress(globals.accept, 2000)[1]:
             self.leave()
         s = font.render('[PRESS Z OR ENTER]', 'fnt_small')
@@ -108,7 +111,7 @@ class room_introimage(Menu):
             self.leave()
 
     def leave(self):
-        globals.chara.go_to_room(rooms.get_room('room_area1'))
+        globals.chara.go_to_room('room_area1')
         self.return_ = False
 
 
@@ -127,12 +130,13 @@ class room_f_intro(Menu):
     def on_enter(self):
         if super().on_enter():
             pygame.display.set_caption('UNDERTALE')
-            pygame.mixer.music.load("mus/mus_story_91.ogg")
-            pygame.mixer.music.play()
+            music.play('mus_story_91')
             self.show_intro()
-            globals.chara.go_to_room(rooms.Room_TEST1())
+            globals.chara.go_to_room(rooms.Room_TEST1)
 
     def show_intro(self):
+        music.prefetch('mus_story_stuck')
+
         def update(s: pygame.Surface, d: draw.Layer):
             d.surface.blit(s, (150, 300))
             d.flip()
@@ -143,6 +147,7 @@ class room_f_intro(Menu):
         t = typer.Typer()
         t.text = "Long ago^1, two races&ruled over Earth^1:&HUMANS and MONSTERS. \E1 ^1 %"
         t.surface = s
+        t.box_width = s.get_width()
         t.to_on_run_loop = self.background_layer
         t.on_run_loop = update
         t.run()
@@ -151,14 +156,16 @@ class room_f_intro(Menu):
         t = typer.Typer()
         t.text = "One day^1, th"
         t.surface = s
+        t.box_width = s.get_width()
         t.to_on_run_loop = self.background_layer
         t.on_run_loop = update
         t.run()
 
-        pygame.time.delay(250)
+        gameclock.clock.sleep(0.25)
         tmp = object()
 
         def glitch():
+            r = random.Random()  # its own, so the game's random sequence doesn't depend on this thread
             c = pygame.time.Clock()
             while 1:
                 try:
@@ -167,21 +174,20 @@ class room_f_intro(Menu):
                     break
                 c.tick(20)
                 s = ''
-                for i in range(random.randint(4, 32)):
-                    s += random.choice(string.printable)
+                for i in range(r.randint(4, 32)):
+                    s += r.choice(string.printable)
                 pygame.display.set_caption(s)
 
         t = threading.Thread(target=glitch, name='title glitcher')
         t.start()
 
-        pygame.mixer.music.load("mus/mus_story_stuck.ogg")
-        pygame.mixer.music.play(-1)
+        music.play('mus_story_stuck', -1)
         self.background_layer.surface.blit(self.image2.image[0], self.image.rect)
         self.background_layer.flip()
         self.text_layer.destroy()
-        pygame.time.wait(5000)
+        gameclock.clock.sleep(5)
         del tmp
-        pygame.time.wait(200)
+        gameclock.clock.sleep(0.2)
         pygame.display.set_caption('Floweytale')
 
 
@@ -196,10 +202,9 @@ class room_nothingness(Menu):
 
     def run_actions(self):
         pygame.display.set_caption('  ')
-        pygame.mixer.music.load("mus/mus_wind.ogg")
-        pygame.mixer.music.play(-1)
+        music.play('mus_wind', -1)
         for i in range(600 if not globals.DEBUG else 5):
-            pygame.time.wait(1000)
+            gameclock.clock.sleep(1)
         surface = pygame.Surface((504, 200))
 
         def update(s: pygame.Surface, d: draw.Layer):
@@ -211,7 +216,7 @@ class room_nothingness(Menu):
             return None
 
         def create(text):
-            return typer.MetaTyper(text, update, self.background_layer, clean, delay=0.1, surface=surface,
+            return typer.MetaTyper(text, update, self.background_layer, clean, delay=3, surface=surface,
                                    can_skip=False)
 
         text = ['Interesting./',
@@ -229,7 +234,7 @@ class room_nothingness(Menu):
         mt.run()
         self.background_layer.surface.fill(pygame.Color('black'))
         self.background_layer.flip()
-        pygame.time.wait(7000)
+        gameclock.clock.sleep(7)
         text = ['Perhaps./',
                 'We can reach a compromise./',
                 'You still have somethin^1g&I want./',
@@ -255,10 +260,10 @@ class room_nothingness(Menu):
             s, choice = mt.run()
             if choice == typer.Typer.CHOICE1:
                 try:
-                    os.remove('system_information_962')
+                    os.remove(os.path.join(globals.save_dir, 'system_information_962'))
                 except FileNotFoundError:
                     pass
-                with open('system_information_963', 'w') as a:
+                with open(os.path.join(globals.save_dir, 'system_information_963'), 'w') as a:
                     a.write('a')
                 text = ['.../',
                         'Then^1, it is done./']
@@ -13,6 +13,7 @@ class Room_TEST1(RoomWalkable):
         self._display_ = pygame.display.get_surface()
         self.objects = [objects.RaiseException((100, 100)), objects.SAVEPoint((200, 200)),
                         objects.TestTextBoxObject((300, 300))]
+        self.sounds = ['snd_power', 'snd_save']
 
 
 class Room_TEST2(RoomWalkable):
@@ -37,13 +38,10 @@ class Room_Unwalkable_Test(Room):
         self.fade_phase = 0
         self.fade_direction = 1
 
-    def update_loop(self):
-        self.fade_phase = 0
-        self.fade_direction = 1
-        while self.run_update:
-            self.fade_phase += self.fade_direction
-            if self.fade_phase >= 255:
-                self.fade_direction = -1
-            elif self.fade_phase <= 0:
-                self.fade_direction = 1
-            self.background.fill(pygame.Color(self.fade_phase, abs(self.fade_phase - 127), 255 - self.fade_phase))
+    def update(self):
+        self.fade_phase += self.fade_direction
+        if self.fade_phase >= 255:
+            self.fade_direction = -1
+        elif self.fade_phase <= 0:
+            self.fade_direction = 1
+        self.background.fill(pygame.Color(self.fade_phase, abs(self.fade_phase - 127), 255 - self.fade_phase))
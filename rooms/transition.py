@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# coding=utf-8
+import threading
+import traceback
+
+import pygame
+import draw
+import gameclock
+import globals
+
+FADE_SECONDS = 0.25  # each way; 0 swaps rooms without fading
+FADE_LAYER = 8  # above everything else, popups included
+
+_local = threading.local()
+
+
+def staging() -> bool:
+    """
+    Is the current thread building a room that isn't shown yet? Such a room must leave the shared layers alone.
+    """
+    return getattr(_local, 'staging', False)
+
+
+class Transition:
+    """
+    A change to another room. The room is built and warmed up on a thread of its own while the current one
+    keeps running; the main loop then swaps them between two frames, behind a fade to black and back.
+    """
+
+    def __init__(self, target, fade: float = FADE_SECONDS):
+        """
+        :param target: the room, or its class or another callable making it, or its number or name.
+        :param fade: seconds to fade out, and again to fade in.
+        """
+        self.target = target
+        self.fade = fade
+        self.room = None
+        self.error = None
+        self.ready = threading.Event()
+        self.frame = 0
+        self.swapped = False
+        self.finished = False
+        self.superseded = False  # another transition replaced this one before its room was shown
+        self.thread = threading.Thread(target=self.build, daemon=True, name='building room {}'.format(getattr(target, '__name__', target)))
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def build(self) -> None:
+        _local.staging = True
+        try:
+            if isinstance(self.target, (str, int)):
+                import rooms
+                room = rooms.get_room(self.target)
+            elif callable(self.target):
+                room = self.target()
+            else:
+                room = self.target
+            room.warm()
+            self.room = room
+            if self.superseded:
+                room.dispose()
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+        finally:
+            _local.staging = False
+            self.ready.set()
+
+    def fade_to(self, alpha: int) -> None:
+        layer = draw.get_layer(FADE_LAYER)
+        layer.surface.fill(pygame.Color(0, 0, 0, alpha))
+        layer.flip()
+
+    def step(self) -> bool:
+        """
+        Advance by one frame. Runs on the main loop, between frames.
+        :return: True when the transition is over.
+        """
+        frames = max(int(gameclock.clock.frames(self.fade)), 1) if self.fade > 0 else 0
+        if not self.swapped:
+            if self.frame < frames:
+                self.frame += 1
+                self.fade_to(255 * self.frame // frames)
+            self.frame = min(self.frame, frames)
+            if self.frame == frames and gameclock.clock.lockstep:
+                self.ready.wait()  # swap on the same frame every time, however long the build takes
+            if self.frame < frames or not self.ready.is_set():
+                return False  # the old room is still on screen, maybe behind the fade
+            if self.error is not None:
+                draw.get_layer(FADE_LAYER).destroy()
+                raise self.error
+            self.swap()
+            self.frame = frames
+        if self.frame > 0:
+            self.frame -= 1
+            self.fade_to(255 * self.frame // frames)
+            return False
+        draw.get_layer(FADE_LAYER).destroy()
+        self.finished = True
+        return True
+
+    def swap(self) -> None:
+        old, new = globals.room, self.room
+        if old is not None and old is not new:
+            old.on_exit()
+        new.show()
+        globals.room = new
+        self.swapped = True
+        # on_enter of a menu runs for as long as the menu does
+        threading.Thread(target=gameclock.clock.following(new.on_enter),
+                         name='on_enter runner for {}'.format(new.__class__.__name__), daemon=True).start()
+        if old is not None and old is not new:
+            old.dispose()
+
+
+class Transitions:
+    """
+    The room change in progress, if any. A new request replaces one whose room isn't shown yet.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.lock = threading.Lock()
+
+    def go(self, target, fade: float = None) -> Transition:
+        transition = Transition(target, FADE_SECONDS if fade is None else fade)
+        with self.lock:
+            if self.current is not None and not self.current.swapped:
+                transition.frame = self.current.frame  # carry on fading from where the replaced one got
+                self.current.superseded = True
+                if self.current.room is not None:
+                    self.current.room.dispose()
+            self.current = transition
+        transition.start()
+        return transition
+
+    def tick(self) -> None:
+        with self.lock:
+            transition = self.current
+        if transition is not None and transition.step():
+            with self.lock:
+                if self.current is transition:
+                    self.current = None
+
+    def busy(self) -> bool:
+        return self.current is not None
+
+
+manager = Transitions()
+
+
+def go(target, fade: float = None) -> Transition:
+    return manager.go(target, fade)
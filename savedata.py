@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+SAVE files on disk: atomic writes, a background writer, and binary snapshots.
+
+A SAVE is handled here as a list of values indexed by file0 line number (index 0 is unused), followed by
+custom data, the free-form lines after line 549.
+"""
+import atexit
+import collections
+import os
+import re
+import struct
+import tempfile
+import threading
+
+LINES = 549
+NAME = 1
+FLAGS = range(31, 543)
+PLOT = 543
+TIME = 549
+
+MAGIC = b'UTSS'
+VERSION = 2
+HEADER = struct.Struct('<4sHH')  # magic, version, length of the name in bytes
+# lines 2-30 (stats, inventory and phone, weapon, armor), plot, lines 544-548 (menu choices, song, room), time
+FIELDS = struct.Struct('<29idiiiiid')
+FIELD_LINES = list(range(2, 31)) + [PLOT] + list(range(544, 549)) + [TIME]
+FLAG_COUNT = struct.Struct('<H')  # flags are mostly 0, so only the others are stored, as (index, value)
+FLAG = struct.Struct('<Hi')
+POSITION = struct.Struct('<iiB')  # x, y, direction; file0 has no place for these
+TAIL = struct.Struct('<I')  # length of the custom data in bytes
+WHOLE_FLOAT = re.compile(r'\.0$', re.MULTILINE)
+
+
+def number(value) -> str:
+    """Write a number the way GameMaker does: no decimal point for whole numbers."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def to_text(values: list, custom_data: [str] = ()) -> str:
+    """
+    Write values as the contents of a canonical file0.
+    """
+    numbers = WHOLE_FLOAT.sub('', '\n'.join(map(str, values[2:LINES + 1])))  # as number() would, all at once
+    return '\n'.join([str(values[NAME]), numbers] + list(custom_data))
+
+
+FIELD_NAMES = {1: 'name', 2: 'lv', 3: 'maxhp', 4: 'maxen', 5: 'at', 6: 'wstrength', 7: 'df', 8: 'adef', 9: 'sp',
+               10: 'xp', 11: 'gold', 12: 'kills', 29: 'weapon', 30: 'armor', PLOT: 'plot', 547: 'currentsong',
+               548: 'room', TIME: 'time'}
+FIELD_NAMES.update({i: 'item{}'.format((i - 13) // 2) for i in range(13, 29, 2)})
+FIELD_NAMES.update({i: 'phone{}'.format((i - 14) // 2) for i in range(14, 29, 2)})
+FIELD_NAMES.update({i: 'flag{}'.format(i - FLAGS.start) for i in FLAGS})
+FIELD_NAMES.update({i: 'menuchoice{}'.format(i - 544) for i in range(544, 547)})
+WHOLE = set(range(2, 31)) | set(range(544, 549))  # lines that must hold whole numbers
+LIMITS = {2: (1, 20), 3: (1, None), 29: (0, None), 30: (0, None), 548: (0, None), TIME: (0, None)}
+LIMITS.update({i: (0, None) for i in range(4, 29)})
+DOGCHECK_ROOMS = set(range(0, 5)) | set(range(239, 264))
+
+ParsedSave = collections.namedtuple('ParsedSave', ['values', 'custom_data', 'errors'])
+
+
+def parse(text: str) -> ParsedSave:
+    """
+    Parse the contents of a file0 and check every field, without touching any game state.
+    Fields that can't be read are None in values. errors lists (line, field name, message) for every problem.
+    """
+    lines = text.split('\n')
+    errors = []
+    if len(lines) < LINES:
+        errors.append((len(lines), 'file', 'has {} lines, a SAVE needs {}'.format(len(lines), LINES)))
+    values = [None, lines[0]]
+    if not lines[0]:
+        errors.append((NAME, 'name', 'is empty'))
+    for line in range(2, LINES + 1):
+        try:
+            raw = lines[line - 1]
+        except IndexError:
+            values.append(None)
+            continue
+        try:
+            value = int(raw)
+        except ValueError:
+            try:
+                value = float(raw)
+            except ValueError:
+                errors.append((line, FIELD_NAMES[line], 'not a number: {!r}'.format(raw)))
+                values.append(None)
+                continue
+            if line in WHOLE:
+                errors.append((line, FIELD_NAMES[line], 'not a whole number: {!r}'.format(raw)))
+        low, high = LIMITS.get(line, (None, None))
+        if (low is not None and value < low) or (high is not None and value > high):
+            errors.append((line, FIELD_NAMES[line], '{} is out of range'.format(raw)))
+        values.append(value)
+    return ParsedSave(values, lines[LINES:], errors)
+
+
+def from_text(text: str) -> (list, [str]):
+    """
+    Read the contents of a file0 into values and custom data. Raise ValueError on the first problem.
+    """
+    parsed = parse(text)
+    if parsed.errors:
+        raise ValueError('line {} ({}) {}'.format(*parsed.errors[0]))
+    return parsed.values, parsed.custom_data
+
+
+def pack(values: list, position: (int, int, int) = (0, 0, 0), custom_data: [str] = ()) -> bytes:
+    """
+    Pack values, a position and custom data into a binary snapshot.
+    """
+    name = str(values[NAME]).encode('utf-8')
+    custom = ''.join('\n' + i for i in custom_data).encode('utf-8')  # one newline per line, so [''] survives
+    flags = [(i - FLAGS.start, int(values[i])) for i in FLAGS if int(values[i])]
+    return b''.join([HEADER.pack(MAGIC, VERSION, len(name)), name,
+                     FIELDS.pack(*[float(values[i]) if i in (PLOT, TIME) else int(values[i]) for i in FIELD_LINES]),
+                     FLAG_COUNT.pack(len(flags))] + [FLAG.pack(*i) for i in flags] + [
+                     POSITION.pack(*position), TAIL.pack(len(custom)), custom])
+
+
+def unpack(data: bytes) -> (list, (int, int, int), [str]):
+    """
+    Read a binary snapshot back.
+    :return: 3-tuple of values, position and custom data.
+    """
+    magic, version, name_length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a version {} snapshot'.format(VERSION))
+    offset = HEADER.size
+    values = [None] * (LINES + 1)
+    values[NAME] = data[offset:offset + name_length].decode('utf-8')
+    offset += name_length
+    for i, j in zip(FIELD_LINES, FIELDS.unpack_from(data, offset)):
+        values[i] = j
+    offset += FIELDS.size
+    values[FLAGS.start:FLAGS.stop] = [0] * len(FLAGS)
+    count, = FLAG_COUNT.unpack_from(data, offset)
+    offset += FLAG_COUNT.size
+    for _ in range(count):
+        index, value = FLAG.unpack_from(data, offset)
+        values[FLAGS.start + index] = value
+        offset += FLAG.size
+    position = POSITION.unpack_from(data, offset)
+    offset += POSITION.size
+    custom_length, = TAIL.unpack_from(data, offset)
+    offset += TAIL.size
+    custom = data[offset:offset + custom_length].decode('utf-8')
+    return values, position, custom.split('\n')[1:]
+
+
+def snapshot_to_text(data: bytes) -> str:
+    """Convert a snapshot to file0 contents. The position is dropped."""
+    values, _, custom_data = unpack(data)
+    return to_text(values, custom_data)
+
+
+def text_to_snapshot(text: str, position: (int, int, int) = (0, 0, 0)) -> bytes:
+    values, custom_data = from_text(text)
+    return pack(values, position, custom_data)
+
+
+def atomic_write(path: str, data) -> None:
+    """
+    Replace a file so that it holds either its old contents or all of data, even if the game or the machine
+    dies halfway: write a temporary file next to it, flush it to disk, and rename it over the original.
+    """
+    # a name of its own for every write, so two writes of one path at once can't rename each other's halves
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                               dir=os.path.dirname(path) or '.')
+    try:
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)  # mkstemp makes it private to us
+        except OSError:
+            os.chmod(tmp, 0o644)
+        with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:  # directories can't be opened on some platforms; the rename is still atomic there
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Writer:
+    """
+    Writes files atomically on a thread of its own, so whoever saves doesn't wait for the disk.
+    If a file is written again before the previous write started, only the latest contents are written.
+    """
+
+    def __init__(self):
+        self.pending = {}  # path -> data
+        self.callbacks = {}  # path -> functions to call with the error, or None, once the write is over
+        self.order = []
+        self.condition = threading.Condition()
+        self.busy = False
+        self.thread = None
+        self.errors = []
+
+    def write(self, path: str, data, done: callable = None) -> None:
+        """
+        Queue data to be written to path. done, if given, is called on the writer's thread once the file
+        holds data or a later write of it, with the OSError if that failed or None.
+        """
+        with self.condition:
+            if path not in self.pending:
+                self.order.append(path)
+            self.pending[path] = data
+            if done is not None:
+                self.callbacks.setdefault(path, []).append(done)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True, name='SAVE writer')
+                self.thread.start()
+                atexit.register(self.flush, 5.0)  # the thread is a daemon, so finish its work before exiting
+            self.condition.notify_all()
+
+    def run(self) -> None:
+        while 1:
+            with self.condition:
+                while not self.order:
+                    self.condition.wait()
+                path = self.order.pop(0)
+                data = self.pending.pop(path)
+                callbacks = self.callbacks.pop(path, [])
+                self.busy = True
+            error = None
+            try:
+                atomic_write(path, data)
+            except OSError as e:
+                error = e
+                self.errors.append((path, e))
+            for i in callbacks:
+                i(error)
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until everything queued so far is on disk. Return False if timeout seconds passed first.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.order and not self.busy, timeout)
+
+
+writer = Writer()
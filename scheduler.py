@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+# coding=utf-8
+import threading
+import traceback
+import types
+
+import gameclock
+
+
+class Task:
+    """
+    Work run by the scheduler on the main loop, between frames. Either a function called every frame
+    (every `every` frames), or a generator resumed once per frame: it yields None to wait one frame,
+    a number of frames to wait that long, or a function to wait until it returns something true.
+    """
+
+    def __init__(self, work, name: str = None, owner=None, every: int = 1):
+        self.work = work
+        self.name = name or getattr(work, '__qualname__', repr(work))
+        self.owner = owner
+        self.every = every
+        self.generator = isinstance(work, types.GeneratorType)
+        self.due = 0  # frame it runs next
+        self.until = None  # condition a generator waits for
+        self.cancelled = False
+        self.finished = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.generator and not self.finished:
+            try:
+                self.work.close()
+            except ValueError:  # closing a generator that is running right now
+                pass
+
+    def run(self, frame: int) -> None:
+        if self.until is not None:
+            if not self.until():
+                self.due = frame + 1
+                return
+            self.until = None
+        if self.generator:
+            wait = next(self.work)
+            if callable(wait):
+                self.until, wait = wait, None
+            self.due = frame + (max(int(wait), 1) if wait is not None else 1)
+        else:
+            if self.work() is False:  # a step function returns False when it is done
+                self.finished = True
+            self.due = frame + self.every
+
+    def __repr__(self):
+        return '<Task {}>'.format(self.name)
+
+
+class Scheduler:
+    """
+    Runs every task on one thread, the main loop, instead of a thread for each. Tasks belong to an owner
+    (a room, an object) and are cancelled with it.
+    """
+
+    def __init__(self):
+        self.tasks = []
+        self.lock = threading.Lock()
+        self.frame = 0
+        self.stats = {'started': 0, 'finished': 0, 'cancelled': 0, 'failed': 0}
+
+    def add(self, work, name: str = None, owner=None, every: int = 1, delay: int = 0) -> Task:
+        """
+        Schedule a step function or a generator. It first runs after delay frames.
+        """
+        task = Task(work, name, owner, every)
+        task.due = self.frame + delay
+        with self.lock:
+            self.tasks.append(task)
+            self.stats['started'] += 1
+        return task
+
+    def cancel(self, owner) -> int:
+        """
+        Cancel every task of owner. Safe to call from any thread and from a task.
+        :return: how many tasks were cancelled.
+        """
+        with self.lock:
+            tasks = [i for i in self.tasks if i.owner is owner and not i.cancelled]
+        for i in tasks:
+            i.cancel()
+        with self.lock:
+            self.stats['cancelled'] += len(tasks)
+        return len(tasks)
+
+    def tick(self) -> None:
+        """
+        Run the tasks that are due. The main loop calls this once a frame.
+        """
+        with self.lock:
+            tasks = list(self.tasks)
+        frame = self.frame
+        for i in tasks:
+            if i.cancelled or i.finished or i.due > frame:
+                continue
+            try:
+                i.run(frame)
+            except StopIteration:
+                i.finished = True
+            except Exception:
+                print('Task {} failed:'.format(i.name))
+                traceback.print_exc()
+                i.finished = True
+                self.stats['failed'] += 1
+        with self.lock:
+            done = [i for i in self.tasks if i.cancelled or i.finished]
+            if done:
+                self.tasks = [i for i in self.tasks if not (i.cancelled or i.finished)]
+                self.stats['finished'] += sum(1 for i in done if i.finished and not i.cancelled)
+            self.frame += 1
+
+    def count(self, owner=None) -> int:
+        with self.lock:
+            return sum(1 for i in self.tasks if not i.cancelled and (owner is None or i.owner is owner))
+
+    def report(self) -> dict:
+        """
+        How much work is going on: live tasks by owner, the threads running in this process, and totals.
+        """
+        with self.lock:
+            tasks = [i for i in self.tasks if not i.cancelled]
+        owners = {}
+        for i in tasks:
+            key = i.owner.__class__.__name__ if i.owner is not None else None
+            owners[key] = owners.get(key, 0) + 1
+        threads = threading.enumerate()
+        return dict(self.stats, tasks=len(tasks), owners=owners, threads=len(threads),
+                    thread_names=sorted(i.name for i in threads))
+
+
+scheduler = Scheduler()
+
+
+def add(work, name: str = None, owner=None, every: int = 1, delay: int = 0) -> Task:
+    return scheduler.add(work, name, owner, every, delay)
+
+
+def seconds(value: float) -> int:
+    """
+    Frames in value seconds at the game's rate, for generators to yield.
+    """
+    return max(int(round(gameclock.clock.frames(value))), 1)
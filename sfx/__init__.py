@@ -1,29 +1,138 @@
 #!/usr/bin/python3
 # coding=utf-8
-import pygame
+import collections
+import json
 import os
+import threading
+import pygame
+
+import perf
+
+SFX_DIR = './sfx/'
+MANIFEST = 'manifest.json'
+
+
+def read_manifest(directory: str) -> {str: dict}:
+    """
+    Read the manifest transcode_audio.py leaves in a directory of sounds. It maps each original WAV file name
+    to {'file': the file to load instead, 'pcm': SHA-1 of the original's frames, in hex}.
+    Return an empty dict if the directory was never transcoded.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+class SoundCache:
+    """
+    Sounds are decoded on first use and kept in an LRU bounded by their decoded size in bytes.
+    Sounds in the preload set (normally the ones the current room declares) are loaded up front
+    and never evicted.
+    """
 
-sounds = {}
-LOADED = False
-try:
-    for i in os.listdir('./sfx/'):
-        try:
-            sounds.update({int(i.split('.')[0], 16): pygame.mixer.Sound('./sfx/' + i)})
-        except ValueError:
-            pass
-        LOADED = True
-except pygame.error:
-    pass
+    def __init__(self, directory: str, budget: int = 8 * 1024 * 1024):
+        self.directory = directory
+        self.budget = budget
+        self.used = 0
+        self.files = None
+        self.entries = collections.OrderedDict()  # id -> (Sound, bytes)
+        self.pinned = set()
+        self.lock = threading.RLock()
+
+    def index(self) -> {int: str}:
+        """
+        Map every sound id to its file, preferring the transcoded one where there is a manifest.
+        Only lists the directory; nothing is decoded.
+        """
+        if self.files is None:
+            files = {}
+            try:
+                names = set(os.listdir(self.directory))
+            except OSError:
+                names = set()
+            for i in names:
+                try:
+                    files.update({int(i.split('.')[0], 16): os.path.join(self.directory, i)})
+                except ValueError:
+                    pass
+            for original, entry in read_manifest(self.directory).items():  # transcoded files win over originals
+                if entry['file'] in names:
+                    files.update({int(original.split('.')[0], 16): os.path.join(self.directory, entry['file'])})
+            self.files = files
+        return self.files
+
+    def load(self, sound: int) -> pygame.mixer.Sound:
+        init = pygame.mixer.get_init()
+        if init is None:
+            raise EnvironmentError('files not loaded')
+        path = self.index()[sound]
+        with perf.timer('sfx', hex(sound)):
+            try:
+                s = pygame.mixer.Sound(path)
+            except pygame.error:
+                raise EnvironmentError('files not loaded')
+        frequency, size, channels = init
+        size = int(s.get_length() * frequency * channels * abs(size) // 8)
+        with self.lock:
+            entry = self.entries.get(sound, None)
+            if entry is not None:  # another thread loaded it meanwhile; keep theirs, so used counts it once
+                self.entries.move_to_end(sound)
+                return entry[0]
+            self.entries[sound] = (s, size)
+            self.used += size
+            self.evict()
+        return s
+
+    def evict(self) -> None:
+        for i in list(self.entries):
+            if self.used <= self.budget:
+                break
+            if i not in self.pinned:
+                self.used -= self.entries.pop(i)[1]
+
+    def get(self, sound: int) -> pygame.mixer.Sound:
+        with self.lock:
+            entry = self.entries.get(sound, None)
+            if entry is not None:
+                self.entries.move_to_end(sound)
+                return entry[0]
+        return self.load(sound)
+
+    def preload(self, sounds: [int]) -> None:
+        """
+        Replace the preload set with these sounds and load any that aren't loaded yet.
+        """
+        with self.lock:
+            self.pinned = set(sounds)
+            missing = [i for i in self.pinned if i not in self.entries]
+        for i in missing:  # decoded without the lock, so sounds already loaded play meanwhile; load inserts them
+            self.load(i)
+        with self.lock:
+            self.evict()
+
+
+cache = SoundCache(SFX_DIR)
 
 
 def get_sound(sound: int) -> pygame.mixer.Sound:
     """
-    Return a Sound with this identifier.
+    Return a Sound with this identifier, loading it if this is the first time it's asked for.
     Sound can be specified by int or a '0x' identifier.
     """
-    if not LOADED:
-        raise EnvironmentError('files not loaded')
     try:
-        return sounds[int(sound, 0)]
+        return cache.get(int(sound, 0))
     except TypeError:
-        return sounds[sound]
+        return cache.get(sound)
+
+
+def preload(sounds: [int]) -> None:
+    cache.preload(sounds)
+
+
+def get_load_timings() -> {str: [int, float, float]}:
+    """
+    :return: for each sound loaded so far, its hex id mapped to [times loaded, total seconds, slowest seconds].
+    """
+    return dict(perf.stats.timings.get('sfx', {}))
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# coding=utf-8
+import threading
+import time
+import pygame
+
+PRIORITY_BLIP = 0
+PRIORITY_EFFECT = 5
+PRIORITY_UI = 10
+
+
+class VoiceManager:
+    """
+    Plays sounds on a fixed pool of reserved mixer channels.
+    A sound may be capped to a number of simultaneous voices (a new one replaces its oldest) and to a minimum
+    interval between starts (starts that come sooner are dropped). When every channel is busy, the oldest voice
+    of the lowest priority not above the new sound's is stolen; if there is none, the new sound is dropped.
+    """
+
+    def __init__(self, size: int = 8):
+        self.size = size
+        self.channels = None
+        self.voices = [None] * size  # per channel: (key, priority, started at)
+        self.limits = {}  # key -> (max voices, min seconds between starts)
+        self.last_start = {}
+        self.stats = {'played': 0, 'stolen': 0, 'dropped': 0}
+        self.lock = threading.Lock()
+
+    def configure(self, key, max_voices: int = None, min_interval: float = 0.0) -> None:
+        self.limits[key] = (max_voices, min_interval)
+
+    def setup(self) -> None:
+        # ours come on top of the channels plain Sound.play already had, so reserving them takes none away
+        pygame.mixer.set_num_channels(pygame.mixer.get_num_channels() + self.size)
+        pygame.mixer.set_reserved(self.size)  # keep plain Sound.play off our channels
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.size)]
+
+    def pick_channel(self, key, priority: int) -> int:
+        busy = []
+        for i, voice in enumerate(self.voices):
+            if voice is None or not self.channels[i].get_busy():
+                self.voices[i] = None
+            else:
+                busy.append((i, voice))
+        max_voices = self.limits.get(key, (None, 0.0))[0]
+        same = [i for i in busy if i[1][0] == key]
+        if max_voices is not None and len(same) >= max_voices:
+            return min(same, key=lambda i: i[1][2])[0]
+        if len(busy) < self.size:
+            return self.voices.index(None)
+        candidates = [i for i in busy if i[1][1] <= priority]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: (i[1][1], i[1][2]))[0]
+
+    def play(self, key, sound: pygame.mixer.Sound, priority: int = PRIORITY_EFFECT,
+             loops: int = 0) -> pygame.mixer.Channel:
+        """
+        Play sound as a voice named key (the sound's name or id).
+        :return: the Channel it plays on, or None if it was dropped.
+        """
+        with self.lock:
+            if self.channels is None:
+                self.setup()
+            now = time.time()
+            min_interval = self.limits.get(key, (None, 0.0))[1]
+            if now - self.last_start.get(key, 0.0) < min_interval:
+                self.stats['dropped'] += 1
+                return None
+            index = self.pick_channel(key, priority)
+            if index is None:
+                self.stats['dropped'] += 1
+                return None
+            if self.voices[index] is not None:
+                self.channels[index].stop()
+                self.stats['stolen'] += 1
+            self.channels[index].play(sound, loops)
+            self.voices[index] = (key, priority, now)
+            self.last_start[key] = now
+            self.stats['played'] += 1
+            return self.channels[index]
+
+    def active(self) -> int:
+        with self.lock:
+            if self.channels is None:
+                return 0
+            return sum(1 for i, voice in enumerate(self.voices) if voice is not None and self.channels[i].get_busy())
+
+
+manager = VoiceManager()
+manager.configure('SND_TXT1', 1, 1 / 30)  # text blips: one at a time, at most one a frame
+manager.configure('SND_TXT2', 1, 1 / 30)
+manager.configure('snd_power', 1, 0.1)  # SAVE menu sounds, which fast input can fire repeatedly
+manager.configure('snd_save', 1, 0.1)
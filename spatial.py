@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+# coding=utf-8
+import math
+import threading
+
+import pygame
+
+CELL_SIZE = 64  # pixels; about the size of an object at scale 2
+
+
+class SpatialHash:
+    """
+    A uniform grid over a room, so finding the objects near a point or in a rectangle looks at a few cells
+    instead of every object. Items need a bounds() method returning a pygame.Rect. An item gets a space
+    attribute pointing here when inserted; call update() with it whenever its bounds change
+    (objects.Object does so when it moves).
+    """
+
+    def __init__(self, items=(), cell_size: int = CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> set of items
+        self.where = {}  # item -> (bounds, cells it is in)
+        self.lock = threading.RLock()  # objects may move on their own threads
+        for i in items:
+            self.insert(i)
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, item):
+        return item in self.where
+
+    def __iter__(self):
+        return iter(list(self.where))
+
+    def keys(self, rect: pygame.Rect) -> tuple:
+        size = self.cell_size
+        return tuple((x, y) for x in range(rect.left // size, (rect.right - 1) // size + 1)
+                     for y in range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def insert(self, item) -> None:
+        rect = pygame.Rect(item.bounds())
+        keys = self.keys(rect)
+        with self.lock:
+            if item in self.where:
+                self.remove(item)
+            for k in keys:
+                self.cells.setdefault(k, set()).add(item)
+            self.where[item] = (rect, keys)
+        item.space = self
+
+    def remove(self, item) -> None:
+        with self.lock:
+            try:
+                _, keys = self.where.pop(item)
+            except KeyError:
+                return
+            for k in keys:
+                cell = self.cells[k]
+                cell.discard(item)
+                if not cell:
+                    del self.cells[k]
+
+    def update(self, item) -> None:
+        """
+        Move an item to where its bounds are now. Cheap when it stays within its cells.
+        """
+        rect = pygame.Rect(item.bounds())
+        keys = self.keys(rect)
+        with self.lock:
+            try:
+                _, old = self.where[item]
+            except KeyError:
+                return
+            if keys != old:
+                for k in old:
+                    cell = self.cells[k]
+                    cell.discard(item)
+                    if not cell:
+                        del self.cells[k]
+                for k in keys:
+                    self.cells.setdefault(k, set()).add(item)
+            self.where[item] = (rect, keys)
+
+    def candidates(self, rect: pygame.Rect) -> set:
+        out = set()
+        with self.lock:
+            for k in self.keys(rect):
+                out.update(self.cells.get(k, ()))
+        return out
+
+    def query_rect(self, rect: pygame.Rect) -> list:
+        """
+        :return: the items whose bounds overlap rect.
+        """
+        rect = pygame.Rect(rect)
+        with self.lock:
+            return [i for i in self.candidates(rect) if self.where[i][0].colliderect(rect)]
+
+    def query_radius(self, pos: (float, float), radius: float) -> list:
+        """
+        :return: the items whose bounds are at most radius away from pos, nearest first.
+        """
+        x, y = pos
+        area = pygame.Rect(int(x - radius), int(y - radius), int(2 * radius) + 2, int(2 * radius) + 2)
+        out = []
+        with self.lock:
+            for i in self.candidates(area):
+                rect = self.where[i][0]
+                dx = max(rect.left - x, 0, x - rect.right)
+                dy = max(rect.top - y, 0, y - rect.bottom)
+                distance = math.hypot(dx, dy)
+                if distance <= radius:
+                    out.append((distance, id(i), i))
+        out.sort(key=lambda i: i[:2])
+        return [i[2] for i in out]
@@ -1,9 +1,93 @@
 #!/usr/bin/python3
 # coding=utf-8
+import array
+import json
+import mmap
+import re
+import threading
 
-with open("strings.txt") as i:
-    strings = i.read().split("\n")
+
+def _map(path: str):
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files can't be mapped
+            return b''
+
+
+class StringTable:
+    """
+    The lines of a text file, read out of a memory map one at a time.
+    Nothing is read until the first lookup, which maps the file and indexes where every line starts;
+    after that a lookup decodes only the line asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = None
+        self.starts = None
+        self.ends = None
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        with self.lock:
+            if self.data is None:
+                data = _map(self.path)
+                self.starts, self.ends = self.index(data)
+                self.data = data
+
+    def index(self, data) -> (array.array, array.array):
+        starts = array.array('L', [0])
+        ends = array.array('L')
+        pos = data.find(b'\n')
+        while pos != -1:
+            ends.append(pos)
+            starts.append(pos + 1)
+            pos = data.find(b'\n', pos + 1)
+        ends.append(len(data))
+        return starts, ends
+
+    def __len__(self):
+        if self.data is None:
+            self.load()
+        return len(self.starts)
+
+    def __getitem__(self, item: int) -> str:
+        if self.data is None:
+            self.load()
+        return self.decode(self.data[self.starts[item]:self.ends[item]])
+
+    def decode(self, raw: bytes) -> str:
+        return raw.decode('utf-8')
+
+
+class JsonStringTable(StringTable):
+    """
+    The same, for a file holding one JSON array of strings, such as decompilation/strings.json.
+    """
+
+    element = re.compile(rb'"(?:[^"\\]|\\.)*"')
+
+    def index(self, data) -> (array.array, array.array):
+        starts = array.array('L')
+        ends = array.array('L')
+        for i in self.element.finditer(data):
+            starts.append(i.start())
+            ends.append(i.end())
+        return starts, ends
+
+    def decode(self, raw: bytes) -> str:
+        return json.loads(raw.decode('utf-8'))
+
+
+strings = StringTable("strings.txt")
+json_strings = JsonStringTable("decompilation/strings.json")
 
 
 def get_string(line: int) -> str:
     return strings[line - 1]
+
+
+def get_json_string(index: int) -> str:
+    """Return string number index (counting from 0) of the decompiled string table."""
+    return json_strings[index]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+The byte-budgeted LRU caches: rendered text and decoded sounds
+"""
+import os
+import shutil
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+pygame.init()
+
+import font
+import sfx
+
+
+def surface(width: int) -> pygame.Surface:
+    return pygame.Surface((width, 1), 0, 32)  # 4 bytes a pixel
+
+
+def test_render_cache_evicts_least_recently_used():
+    c = font.RenderCache(budget=100)
+    c.put('a', surface(10))
+    c.put('b', surface(10))
+    assert c.get('a') is not None  # a is now the most recently used
+    c.put('c', surface(10))
+    assert c.used == 80
+    assert c.get('b') is None
+    assert c.get('a') is not None
+    assert c.get('c') is not None
+    assert (c.hits, c.misses) == (3, 1)
+
+
+def test_render_cache_replaces_and_skips_oversized():
+    c = font.RenderCache(budget=100)
+    c.put('a', surface(10))
+    c.put('a', surface(20))
+    assert c.used == 80
+    assert len(c.entries) == 1
+    c.put('huge', surface(26))  # bigger than the whole budget: not cached, nothing evicted
+    assert c.get('huge') is None
+    assert c.get('a') is not None
+    c.clear()
+    assert c.used == 0
+    assert c.get('a') is None
+
+
+def sound_cache(ids: [int]) -> sfx.SoundCache:
+    """
+    A cache of a directory holding a short silent WAV for each id, which the caller removes.
+    """
+    directory = tempfile.mkdtemp(prefix='sfx-')
+    for i in ids:
+        with wave.open(os.path.join(directory, '{:x}.wav'.format(i)), 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(22050)
+            f.writeframes(b'\x00\x00' * 2205)
+    return sfx.SoundCache(directory)
+
+
+def test_sound_cache_evicts_least_recently_used():
+    c = sound_cache([1, 2, 3])
+    try:
+        s = c.get(1)
+        assert c.get(1) is s
+        size = c.used
+        c.budget = 2 * size
+        c.get(2)
+        c.get(1)
+        c.get(3)
+        assert list(c.entries) == [1, 3]
+        assert c.used == 2 * size
+    finally:
+        shutil.rmtree(c.directory)
+
+
+def test_sound_cache_keeps_preloaded():
+    c = sound_cache([1, 2, 3])
+    try:
+        c.budget = 1
+        c.preload([1, 2])
+        assert set(c.entries) == {1, 2}
+        c.get(3)  # over budget, and the only sound that may go
+        assert set(c.entries) == {1, 2}
+        c.preload([2])
+        assert list(c.entries) == [2]
+        assert c.used == c.entries[2][1]
+    finally:
+        shutil.rmtree(c.directory)
+
+
+if __name__ == '__main__':
+    test_render_cache_evicts_least_recently_used()
+    test_render_cache_replaces_and_skips_oversized()
+    test_sound_cache_evicts_least_recently_used()
+    test_sound_cache_keeps_preloaded()
+    print('ok')
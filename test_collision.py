@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Mask collisions, and Frisk sliding along what blocks them
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))  # collision.SPRITE_DIR is relative
+
+import pygame
+
+import collision
+
+
+def box(x: int, y: int, w: int, h: int) -> collision.Collider:
+    mask = pygame.mask.Mask((w, h), fill=True)
+    return collision.Collider(pygame.Rect(x, y, w, h), (x, y), mask)
+
+
+def corner(x: int, y: int) -> collision.Collider:
+    """
+    A 20x20 collider whose only set pixels are its top and left edges, so its box is mostly empty.
+    """
+    mask = pygame.mask.Mask((20, 20))
+    for i in range(20):
+        mask.set_at((i, 0))
+        mask.set_at((0, i))
+    return collision.Collider(pygame.Rect(x, y, 20, 20), (x, y), mask)
+
+
+def test_masks_decide_overlap():
+    wall = corner(0, 0)
+    assert box(5, 5, 10, 10).rect.colliderect(wall.rect)
+    assert not box(5, 5, 10, 10).overlaps(wall)
+    assert box(5, -5, 10, 6).overlaps(wall)
+    assert not box(20, 0, 10, 10).overlaps(wall)
+    assert box(5, 5, 10, 10).moved(-5, 0).overlaps(wall)
+
+
+def test_move_slides_along_walls():
+    solids = collision.Solids([box(0, 20, 100, 10)])  # a floor below the player
+    player = box(10, 0, 10, 10)
+    assert solids.move(player, 3, 0) == (3, 0)
+    assert solids.move(player, 3, 15) == (3, 0)  # can't go down, slides right
+    assert solids.move(player, 0, 15) == (0, 0)
+    assert solids.move(player, 0, 10) == (0, 10)  # right up to it is fine
+    assert collision.Solids().move(player, 0, 50) == (0, 50)
+
+
+def test_hits():
+    a, b = box(0, 0, 10, 10), corner(50, 50)
+    solids = collision.Solids([a, b])
+    assert solids.hits(box(5, 5, 10, 10)) == [a]
+    assert solids.hits(box(55, 55, 5, 5)) == []
+    assert solids.blocked(box(45, 55, 10, 5))
+
+
+def test_place_scales_and_mirrors():
+    shape = collision.shapes['spr_maincharad']
+    c = collision.place('spr_maincharad', (100, 100), 2, 2)
+    assert c.mask.get_size() == (shape.size[0] * 2, shape.size[1] * 2)
+    assert c.rect.size == (shape.bbox.width * 2, shape.bbox.height * 2)
+    assert c.mask.count() == shape.bbox.width * shape.bbox.height * 4
+    mirrored = collision.place('spr_maincharad', (100, 100), -2, 2)
+    assert mirrored.rect.size == c.rect.size
+    assert mirrored.rect.top == c.rect.top
+    assert c.overlaps(c.moved(0, 0))
+    assert collision.masks[('spr_maincharad', 2, 2)] is c.mask
+
+
+if __name__ == '__main__':
+    test_masks_decide_overlap()
+    test_move_slides_along_walls()
+    test_hits()
+    test_place_scales_and_mirrors()
+    print('ok')
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Items read out of the decompiled GML scripts, and the shared instances made from them
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))  # item.CODE_DIR is relative
+
+import item
+
+SWITCH = '''0x000000:
+    if (== self.itemid 1s) goto 0x000100
+0x000010:
+    if (== self.itemid 2s) goto 0x000200
+0x000020:
+    if (== self.itemid 3s) goto 0x000100
+0x000030:
+    if (== self.other 4s) goto 0x000300
+0x000040:
+    goto 0x000400
+0x000100:
+    stog.itemnameb[(int32 self.i)] = "Shared   "
+    goto 0x000400
+0x000200:
+    if !(== global.seriousbattle 0s) goto 0x000220
+0x000210:
+    stog.itemnameb[(int32 self.i)] = "Silly"
+0x000220:
+    if !(== global.seriousbattle 1s) goto 0x000240
+0x000230:
+    stog.itemnameb[(int32 self.i)] = "Say \\"no\\""
+0x000240:
+    stog.itemnameb[1s] = -12s
+    goto 0x000400
+0x000300:
+    stog.itemnameb[(int32 self.i)] = "Not an item"
+0x000400:
+    exit
+'''
+
+
+def test_read_switch():
+    with tempfile.NamedTemporaryFile('w', suffix='.gml.lsp', delete=False) as f:
+        f.write(SWITCH)
+    try:
+        cases = item.read_switch(f.name, 'itemid', 'itemnameb')
+    finally:
+        os.remove(f.name)
+    assert cases == {1: [(None, 0, 'Shared   ')],
+                     2: [(0, 0, 'Silly'), (1, 0, 'Say "no"'), (None, 1, -12)],
+                     3: [(None, 0, 'Shared   ')]}
+
+
+def test_build():
+    data = {i.id: i for i in item.build()}
+    assert data[1] == item.ItemData(1, 'Monster Candy', 'MnstrCndy', 'MnstrCndy', 25, (
+        '* "Monster Candy" - Heals 10 HP&* Has a distinct,^1 &  non-licorice flavor./%',), None, None)
+    assert (data[6].shortname, data[6].seriousname) == ('PunkRings', 'PmknRings')
+    assert data[14].strength == 5
+    assert data[14].defense is None
+
+
+def test_registry():
+    candy = item.get_item(1)
+    assert isinstance(candy, item.MonsterCandy)
+    assert candy.value == 25
+    assert item.get_item(1) is candy
+    donut = item.get_item(7)  # no class of its own
+    assert type(donut) is item.Item
+    assert donut.name == 'Spider Donut'
+    assert item.get_item(10 ** 6) is item.get_item(0)
+    assert not item.get_item(0)
+    try:
+        item.get_item(-1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('a negative id counted from the end of the table')
+
+
+def test_items_are_read_only():
+    candy = item.get_item(1)
+    for name, value in [('name', 'Monster Candy?'), ('value', 0), ('anything', 1)]:
+        try:
+            setattr(candy, name, value)
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError('set {} of a shared item'.format(name))
+    assert candy.name == 'Monster Candy'
+
+
+if __name__ == '__main__':
+    test_read_switch()
+    test_build()
+    test_registry()
+    test_items_are_read_only()
+    print('ok')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Text layout: measuring, wrapping Typer markup and fitting fonts to a width
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+pygame.init()
+
+import layout
+
+FONT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts', 'determinationmono.ttf')
+
+
+class FixedMetrics(layout.Metrics):
+    """
+    Every symbol 10 pixels wide.
+    """
+
+    def __init__(self):
+        self.font = None
+        self.line_height = 10
+        self.advances = {}
+
+    def advance(self, char: str) -> int:
+        return 10
+
+
+def lines(text: str) -> [str]:
+    return ''.join(s for kind, s in layout.tokenize(text) if kind != 'command').split('&')
+
+
+def test_tokenize():
+    assert layout.tokenize('\\E1a^2&\\Rb/') == [('command', '\\E1'), ('char', 'a'), ('command', '^2'),
+                                                 ('newline', '&'), ('command', '\\R'), ('char', 'b'),
+                                                 ('command', '/')]
+
+
+def test_wrap_breaks_at_spaces():
+    assert layout.wrap_markup('hello world foo', 50, FixedMetrics()) == 'hello&world&foo'
+    assert layout.wrap_markup('ab cd ef gh', 50, FixedMetrics()) == 'ab cd&ef gh'
+
+
+def test_wrap_commands_take_no_room():
+    text = layout.wrap_markup('\\E1ab^1cd ef^2 gh/', 50, FixedMetrics())
+    assert text == '\\E1ab^1cd&ef^2 gh/'
+    assert all(len(i) * 10 <= 50 for i in lines(text))
+
+
+def test_wrap_keeps_breaks():
+    assert layout.wrap_markup('ab&cd ef gh', 50, FixedMetrics()) == 'ab&cd ef&gh'
+
+
+def test_wrap_splits_long_words():
+    assert layout.wrap_markup('abcdefghij', 50, FixedMetrics()) == 'abcde&fghij'
+
+
+def test_wrap_measures_real_fonts():
+    m = layout.metrics(layout.get_font(FONT, 32))
+    text = layout.wrap_markup('* A very long line of popup text that surely does not fit in the box', 504, m)
+    assert '&' in text
+    assert all(m.width(i) <= 504 for i in lines(text))
+    assert layout.metrics(layout.get_font(FONT, 32)) is m
+
+
+def test_fit_font():
+    text = 'The quick brown fox jumps over the lazy dog'
+    largest = [i for i in range(1, 33) if layout.get_font(FONT, i).size(text)[0] < 400][-1]
+    assert largest < 32
+    assert layout.fit_font(FONT, text, 400, 32) is layout.get_font(FONT, largest)
+    assert layout.fit_font(FONT, 'short', 400, 32) is layout.get_font(FONT, 32)
+    assert layout.fit_font(FONT, text, 1, 32, 4) is layout.get_font(FONT, 4)
+
+
+if __name__ == '__main__':
+    test_tokenize()
+    test_wrap_breaks_at_spaces()
+    test_wrap_commands_take_no_room()
+    test_wrap_keeps_breaks()
+    test_wrap_splits_long_words()
+    test_wrap_measures_real_fonts()
+    test_fit_font()
+    print('ok')
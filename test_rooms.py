@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Rooms built the way transitions build them, off screen on a thread of their own
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+pygame.init()
+pygame.display.set_mode((640, 480))
+
+import globals
+from rooms import tests, transition
+
+
+def test_staged_room_has_space():
+    t = transition.Transition(tests.Room_TEST1, 0)
+    t.start()
+    t.thread.join()
+    room = t.room
+    assert t.error is None
+    assert room is not None
+    assert len(room.space) == len(room.objects)
+    assert all(i.space is room.space for i in room.objects)
+    assert room.space.query_radius(room.objects[0].pos, 1)
+    room.dispose()
+
+
+if __name__ == '__main__':
+    test_staged_room_has_space()
+    print('ok')
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+SAVE files read, checked, packed into snapshots and written back
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import savedata
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'file0')) as f:
+    FILE0 = f.read()
+
+
+def test_text_round_trip():
+    parsed = savedata.parse(FILE0)
+    assert parsed.errors == []
+    assert len(parsed.values) == savedata.LINES + 1
+    assert savedata.to_text(parsed.values, parsed.custom_data) == FILE0
+
+
+def test_parse_reports_every_problem():
+    lines = FILE0.split('\n')
+    lines[2 - 1] = '25'  # LV above 20
+    lines[11 - 1] = 'lots'  # gold
+    lines[548 - 1] = '1.5'  # room
+    parsed = savedata.parse('\n'.join(lines))
+    assert [i[:2] for i in parsed.errors] == [(2, 'lv'), (11, 'gold'), (548, 'room')]
+    assert parsed.values[11] is None
+    assert parsed.values[2] == 25
+
+
+def test_parse_short_file():
+    parsed = savedata.parse('\n'.join(FILE0.split('\n')[:100]))
+    assert parsed.errors[0][1] == 'file'
+    assert parsed.values[200] is None
+    try:
+        savedata.from_text('\n'.join(FILE0.split('\n')[:100]))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('from_text accepted a short file')
+
+
+def test_pack_round_trip():
+    values, custom_data = savedata.from_text(FILE0)
+    values[savedata.FLAGS.start + 7] = -3
+    values[savedata.FLAGS.stop - 1] = 12
+    custom_data = ['', 'custom', 'ünïcode']
+    data = savedata.pack(values, (120, -40, 2), custom_data)
+    unpacked, position, unpacked_custom = savedata.unpack(data)
+    assert unpacked[1:] == values[1:]
+    assert position == (120, -40, 2)
+    assert unpacked_custom == custom_data
+
+
+def test_pack_stores_only_set_flags():
+    values, _ = savedata.from_text(FILE0)
+    values[savedata.FLAGS.start:savedata.FLAGS.stop] = [0] * len(savedata.FLAGS)
+    empty = len(savedata.pack(values))
+    values[savedata.FLAGS.start] = 1
+    assert len(savedata.pack(values)) == empty + savedata.FLAG.size
+
+
+def test_snapshot_to_text():
+    assert savedata.snapshot_to_text(savedata.text_to_snapshot(FILE0, (1, 2, 3))) == FILE0
+
+
+def test_unpack_rejects_other_data():
+    for data in [b'UTSS\x01\x00\x00\x00', b'file0 text, not a snapshot']:
+        try:
+            savedata.unpack(data)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('unpack accepted {!r}'.format(data))
+
+
+def test_atomic_write():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'file0')
+        savedata.atomic_write(path, 'old')
+        savedata.atomic_write(path, FILE0)
+        with open(path) as f:
+            assert f.read() == FILE0
+        savedata.atomic_write(path, b'\x00snapshot')
+        with open(path, 'rb') as f:
+            assert f.read() == b'\x00snapshot'
+        assert os.listdir(directory) == ['file0']
+
+
+def test_writer_calls_back():
+    done = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'file0')
+        writer = savedata.Writer()
+        writer.write(path, 'first')
+        writer.write(path, FILE0, done.append)
+        assert writer.flush(5.0)
+        with open(path) as f:
+            assert f.read() == FILE0
+    assert done == [None]
+
+
+if __name__ == '__main__':
+    test_text_round_trip()
+    test_parse_reports_every_problem()
+    test_parse_short_file()
+    test_pack_round_trip()
+    test_pack_stores_only_set_flags()
+    test_snapshot_to_text()
+    test_unpack_rejects_other_data()
+    test_atomic_write()
+    test_writer_calls_back()
+    print('ok')
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tasks run by the scheduler on the main loop: when they run, finish, wait and are cancelled
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scheduler
+
+
+def run(s: scheduler.Scheduler, frames: int) -> None:
+    for _ in range(frames):
+        s.tick()
+
+
+def test_step_function():
+    s = scheduler.Scheduler()
+    calls = []
+
+    def step():
+        calls.append(s.frame)
+        return len(calls) < 3
+
+    task = s.add(step, every=2, delay=1)
+    run(s, 10)
+    assert calls == [1, 3, 5]
+    assert task.finished
+    assert s.count() == 0
+    assert s.stats['finished'] == 1
+
+
+def test_generator_waits():
+    s = scheduler.Scheduler()
+    seen = []
+    flag = []
+
+    def work():
+        seen.append(s.frame)
+        yield
+        seen.append(s.frame)
+        yield 3
+        seen.append(s.frame)
+        yield lambda: flag
+        seen.append(s.frame)
+
+    task = s.add(work())
+    run(s, 8)
+    assert seen == [0, 1, 4]
+    assert not task.finished
+    flag.append(1)
+    run(s, 2)
+    assert seen == [0, 1, 4, 8]
+    assert task.finished
+
+
+def test_cancel_by_owner():
+    s = scheduler.Scheduler()
+    owner, other = object(), object()
+    closed = []
+
+    def work():
+        try:
+            while 1:
+                yield
+        finally:
+            closed.append(1)
+
+    a = s.add(work(), owner=owner)
+    s.add(lambda: None, owner=owner)
+    b = s.add(lambda: None, owner=other)
+    run(s, 2)
+    assert s.count(owner) == 2
+    assert s.cancel(owner) == 2
+    assert closed == [1]
+    assert a.cancelled
+    assert s.count(owner) == 0
+    run(s, 1)
+    assert s.tasks == [b]
+    assert s.cancel(owner) == 0
+    assert s.stats['cancelled'] == 2
+
+
+def test_task_cancels_itself():
+    s = scheduler.Scheduler()
+    owner = object()
+    ran = []
+
+    def work():
+        ran.append(1)
+        s.cancel(owner)
+        yield
+
+    s.add(work(), owner=owner)
+    run(s, 3)
+    assert ran == [1]
+    assert s.tasks == []
+
+
+def test_failure_stops_only_that_task():
+    s = scheduler.Scheduler()
+    calls = []
+
+    def broken():
+        raise RuntimeError('expected by the test')
+
+    s.add(broken, name='broken')
+    s.add(lambda: calls.append(1))
+    run(s, 3)
+    assert calls == [1, 1, 1]
+    assert s.stats['failed'] == 1
+    assert all(i.name != 'broken' for i in s.tasks)
+    assert s.report()['tasks'] == 1
+
+
+if __name__ == '__main__':
+    test_step_function()
+    test_generator_waits()
+    test_cancel_by_owner()
+    test_task_cancels_itself()
+    test_failure_stops_only_that_task()
+    print('ok')
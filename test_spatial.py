@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+The spatial hash rooms index their objects in
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+
+import spatial
+
+
+class Box:
+    def __init__(self, x: int, y: int, w: int = 10, h: int = 10):
+        self.rect = pygame.Rect(x, y, w, h)
+        self.space = None
+
+    def bounds(self) -> pygame.Rect:
+        return self.rect
+
+
+def test_insert_and_query():
+    a, b, c = Box(0, 0), Box(100, 100), Box(60, 0, 10, 200)  # c spans cells
+    space = spatial.SpatialHash([a, b, c])
+    assert len(space) == 3
+    assert all(i.space is space for i in (a, b, c))
+    assert space.query_rect(pygame.Rect(5, 5, 10, 10)) == [a]
+    assert set(space.query_rect(pygame.Rect(0, 0, 200, 200))) == {a, b, c}
+    assert space.query_rect(pygame.Rect(20, 20, 30, 30)) == []  # same cell as a, but not touching it
+    assert space.query_rect(pygame.Rect(65, 150, 1, 1)) == [c]
+
+
+def test_query_radius_nearest_first():
+    a, b, c = Box(0, 0), Box(30, 0), Box(500, 500)
+    space = spatial.SpatialHash([c, b, a])
+    assert space.query_radius((5, 5), 40) == [a, b]
+    assert space.query_radius((25, 5), 1) == []
+    assert space.query_radius((25, 5), 5) == [b]
+    assert space.query_radius((505, 505), 0) == [c]
+
+
+def test_update_and_remove():
+    a = Box(0, 0)
+    space = spatial.SpatialHash([a])
+    a.rect.topleft = (300, 300)
+    assert space.query_rect(pygame.Rect(300, 300, 5, 5)) == []  # not told yet
+    space.update(a)
+    assert space.query_rect(pygame.Rect(300, 300, 5, 5)) == [a]
+    assert space.query_rect(pygame.Rect(0, 0, 5, 5)) == []
+    space.remove(a)
+    assert a not in space
+    assert space.cells == {}
+    space.update(a)  # no longer indexed: nothing happens
+    space.remove(a)
+    assert len(space) == 0
+
+
+def test_insert_twice_moves():
+    a = Box(0, 0)
+    space = spatial.SpatialHash([a])
+    a.rect.topleft = (200, 0)
+    space.insert(a)
+    assert len(space) == 1
+    assert list(space.cells) == [(3, 0)]
+
+
+if __name__ == '__main__':
+    test_insert_and_query()
+    test_query_radius_nearest_first()
+    test_update_and_remove()
+    test_insert_twice_moves()
+    print('ok')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Build-time transcoding of the sound libraries.
+
+Every WAV in sfx/ and decompilation/audio/ longer than --short seconds is encoded to OGG Vorbis next to the
+original, with ffmpeg or oggenc, whichever is installed. Short clips stay WAV: they are small anyway, and
+uncompressed PCM loads faster than a Vorbis stream can be set up. An OGG that doesn't come out clearly
+smaller than its WAV is thrown away too. Each directory gets a manifest.json mapping the original file names
+to the files to load and to digests of the original audio, which sfx and audio read instead of the WAVs.
+
+Runs are incremental. With --prune the transcoded WAVs are deleted afterwards, which is what the web build
+wants; keep them locally, since the next run needs them to notice changes.
+
+    python3 transcode_audio.py [--short SECONDS] [--quality Q] [--prune] [DIRECTORY ...]
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import wave
+
+DIRECTORIES = ['sfx', 'decompilation/audio']
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+SHORT_SECONDS = 0.5
+MIN_SAVING = 0.8  # keep an OGG only if it is at most this fraction of the WAV's size
+
+
+def find_encoder(quality):
+    """Return a function making the command that encodes one file, or None if no encoder is installed."""
+    if shutil.which('ffmpeg'):
+        return lambda src, dst: ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-i', src,
+                                 '-c:a', 'libvorbis', '-q:a', str(quality), dst]
+    if shutil.which('oggenc'):
+        return lambda src, dst: ['oggenc', '-Q', '-q', str(quality), '-o', dst, src]
+    return None
+
+
+def inspect(path):
+    """Return the duration in seconds and the SHA-1 of the frames of a WAV, as audio.py computes it."""
+    w = wave.open(path)
+    try:
+        frames = w.readframes(w.getnframes())
+        return w.getnframes() / w.getframerate(), hashlib.sha1(frames).hexdigest()
+    finally:
+        w.close()
+
+
+def transcode(directory, name, encoder, short):
+    """Bring one WAV's output up to date and return its manifest entry and the bytes it saves."""
+    src = os.path.join(directory, name)
+    ogg = os.path.splitext(name)[0] + '.ogg'
+    dst = os.path.join(directory, ogg)
+    try:
+        seconds, pcm = inspect(src)
+    except (EOFError, wave.Error) as e:
+        print('  skipping {}: {}'.format(src, e))
+        return None, 0
+    entry = {'file': name, 'pcm': pcm}
+    if encoder is None or seconds < short:
+        return entry, 0
+    if not os.path.exists(dst) or os.path.getmtime(dst) < os.path.getmtime(src):
+        result = subprocess.run(encoder(src, dst), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            print('  encoding {} failed: {}'.format(src, result.stderr.decode(errors='replace').strip()))
+            return entry, 0
+    if os.path.getsize(dst) > os.path.getsize(src) * MIN_SAVING:
+        os.remove(dst)
+        return entry, 0
+    entry['file'] = ogg
+    return entry, os.path.getsize(src) - os.path.getsize(dst)
+
+
+def process(directory, encoder, short, prune, jobs):
+    path = os.path.join(directory, MANIFEST)
+    try:
+        with open(path) as f:
+            old = json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        old = {}
+    names = sorted(i for i in os.listdir(directory) if i.endswith('.wav'))
+    files = {}
+    # entries whose WAV was pruned by an earlier run stay as they are
+    for name, entry in old.items():
+        if name not in names and os.path.exists(os.path.join(directory, entry['file'])):
+            files[name] = entry
+    saved = 0
+    with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+        results = pool.map(lambda i: (i, transcode(directory, i, encoder, short)), names)
+        for name, (entry, saving) in results:
+            if entry is not None:
+                files[name] = entry
+                saved += saving
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    transcoded = [name for name, entry in files.items() if entry['file'] != name]
+    print('{}: {} files, {} transcoded, {:.1f} MB saved'.format(directory, len(files), len(transcoded),
+                                                               saved / 1024 / 1024))
+    if prune:
+        for name in transcoded:
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transcode the sound libraries to OGG and write manifests.')
+    parser.add_argument('directories', nargs='*', default=DIRECTORIES)
+    parser.add_argument('--short', type=float, default=SHORT_SECONDS,
+                        help='keep clips shorter than this many seconds as WAV (default %(default)s)')
+    parser.add_argument('--quality', type=int, default=4, help='Vorbis quality, 0 to 10 (default %(default)s)')
+    parser.add_argument('--prune', action='store_true', help='delete WAVs that were transcoded')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    encoder = find_encoder(args.quality)
+    if encoder is None:
+        print('⚠️  Neither ffmpeg nor oggenc found; writing manifests without transcoding.')
+    for directory in args.directories:
+        if os.path.isdir(directory):
+            process(directory, encoder, args.short, args.prune and encoder is not None, args.jobs)
+        else:
+            print('{}: not found, skipped'.format(directory))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,8 +3,13 @@
 import time
 import pygame
 import actor
+import audio
+import gameclock
 import globals
+import input
+import layout
 import sprite
+from sfx import voices
 
 
 class Typer:
@@ -19,30 +24,38 @@ class Typer:
         Base class for typers.
         """
         pygame.init()
-        self.font = pygame.font.Font('fonts/determinationmono.ttf', 32)
+        self.font = layout.get_font('fonts/determinationmono.ttf', 32)
         self.antialias = False
         self.color = pygame.Color('white')
         self.text = ''
         self.actor = actor.Actor()
         self.scan_cursor = 0
-        self.delay = 0.05
+        self.delay = 1.5  # in frames
         self.background = pygame.Color('black')
         self.symbols = []
         self.display_symbols = []
         self.letter_spacing = 0
         self.line_spacing = 0
+        self.box_width = None  # if set, wrap the text to this many pixels before typing it
+        self.laid_out = False
         self.column = 0
         self.line = 0
         self.delay_next = None
         self.delay_skipped_step = False
+        self.wait_frames = 0.0
         self.surface = pygame.Surface((1, 1))
         self.on_symbol = lambda: None
+        self.blip = None  # sound name played for every letter typed, e.g. 'SND_TXT1'
         self.to_on_run_loop = None
         self.on_run_loop = lambda s, o: None
         self.can_skip = True
         self.choice_mode = False
         self.choice = 0
         self.pause = False
+        self.heart = None
+        self.skipping = False
+        self.finished = False
+        self.result = None
 
     def set_color(self, color: str) -> None:
         """
@@ -60,7 +73,7 @@ class Typer:
     def next_symbol(self) -> float:
         """
         Parse the next symbol. If it is a command, interpret the command instead
-        :return: The number of seconds to delay after this if typewriting.
+        :return: The number of frames to delay after this if typewriting.
         :raises IndexError if trying to parse past the end of text.
         """
         if self.text[self.scan_cursor] == '\\':  # general-purpose commands
@@ -94,10 +107,10 @@ class Typer:
             self.scan_cursor += 1
             if self.delay_next:
                 tmp = self.delay_next
-                self.delay_next = num * 0.333
+                self.delay_next = num * gameclock.FPS / 3
                 return tmp
             else:
-                self.delay_next = num * 0.333
+                self.delay_next = num * gameclock.FPS / 3
                 return 0.0
         elif self.text[self.scan_cursor] == '&':  # command to break line
             self.line += 1
@@ -109,6 +122,11 @@ class Typer:
             return 0.0
         else:  # normal symbols
             self.on_symbol()
+            if self.blip is not None and not self.skipping and self.text[self.scan_cursor] != ' ':
+                try:
+                    audio.play(self.blip, voices.PRIORITY_BLIP)
+                except EnvironmentError:  # no mixer
+                    pass
             self.symbols.append([self.text[self.scan_cursor], self.line, self.column, self.color])
             self.scan_cursor += 1
             self.column += 1
@@ -123,10 +141,11 @@ class Typer:
         """
         From the symbols list, create a list of surfaces with coords where to blit them.
         """
+        m = layout.metrics(self.font)
         for i in self.symbols[len(self.display_symbols):]:
             symb = self.font.render(i[0], self.antialias, i[3])
-            x = (self.font.get_linesize() + self.line_spacing) * i[1]
-            y = (self.font.size("W")[0] + self.letter_spacing) * i[2]
+            x = (m.line_height + self.line_spacing) * i[1]
+            y = (m.advance("W") + self.letter_spacing) * i[2]
             self.display_symbols.append((symb, y, x, i[0]))
 
     def render(self) -> None:
@@ -136,6 +155,11 @@ class Typer:
         self.surface.fill(self.background)
         for i in self.display_symbols:
             self.surface.blit(i[0], (i[1], i[2]))
+        if self.choice_mode:
+            if self.heart is None:
+                self.heart = sprite.Sprite.get_sprite('spr_heart', 1)
+            self.heart.rect.center = (132, 82) if self.choice == 0 else (325, 82)
+            self.surface.blit(self.heart.image[0], self.heart.rect)
 
     def run_wrapper(self) -> None:
         """
@@ -150,49 +174,80 @@ class Typer:
                 except TypeError:
                     self.on_run_loop()
 
-    def run(self) -> int:
+    def tick(self) -> bool:
         """
-        Iterate over the text, with appropriate delays, running on_run_loop every iteration.
-        Return when the text is completely rendered. Return values statically defined by Typer class.
+        Advance the text by one frame, typing out as many symbols as are due, and redraw.
+        While paused or choosing, nothing happens until on_key gets the right key.
+        :return: True once the text is finished; the outcome is then in self.result.
         """
-        will_skip = False
-        while 1:
-            try:
+        if self.finished:
+            return True
+        if self.pause or self.choice_mode:
+            return False
+        if not self.laid_out:
+            if self.box_width is not None:
+                self.text = layout.wrap_markup(self.text, self.box_width, layout.metrics(self.font))
+            self.laid_out = True
+        self.wait_frames -= 1
+        try:
+            while (self.wait_frames <= 0 or self.skipping) and not (self.pause or self.choice_mode):
                 try:
-                    delay = self.next_symbol()
+                    self.wait_frames += self.next_symbol()
                 except TypeError:
-                    delay = 0
-                self.place_symbols()
+                    pass
+        except IndexError:
+            self.finished = True
+            self.result = Typer.SKIPPED if self.skipping else Typer.NOTSKIPPED
+        if self.skipping:
+            self.wait_frames = 0.0
+        self.place_symbols()
+        self.render()
+        self.run_wrapper()
+        return self.finished
+
+    def on_key(self, key: int) -> None:
+        """
+        Feed a pressed key to the typer.
+        """
+        if self.choice_mode:
+            if key in [globals.left, globals.right]:
+                self.choice = 1 if self.choice == 0 else 0
                 self.render()
                 self.run_wrapper()
-                if not will_skip:
-                    time.sleep(delay if delay else 0)
+            elif key in globals.accept:
+                self.choice_mode = False
+                self.finished = True
+                self.result = Typer.CHOICE1 if self.choice == 0 else Typer.CHOICE2
+        elif self.pause:
+            if key in globals.accept:
+                self.pause = False
+        elif self.can_skip and key in globals.cancel:
+            self.skipping = True
+
+    def run(self) -> int:
+        """
+        Type out the whole text, one tick per game frame, running on_run_loop on every redraw.
+        Blocks until the text is completely rendered, so call this from a thread other than the main loop,
+        or call tick and on_key from the main loop instead. Return values statically defined by Typer class.
+        """
+        consumer = input.dispatcher.push_focus(input.Consumer('typer'), input.FOCUS_TEXT)
+        try:
+            while not self.tick():
+                pump_here = not input.dispatcher.is_pumping()
+                if pump_here:
+                    input.dispatcher.pump()  # no main loop is reading events, so read them here
+                if (self.pause or self.choice_mode) and not gameclock.clock.lockstep:
+                    # nothing moves until a key comes, so sleep until one does; in lockstep, keys come on frames
+                    events = [consumer.wait(1 / gameclock.clock.fps if pump_here else 0.5)]
                 else:
-                    pass
-                if self.can_skip:
-                    for i in pygame.event.get(pygame.KEYDOWN):
-                        if i.key in globals.cancel:
-                            will_skip = True
-                while self.pause:
-                    for i in pygame.event.get(pygame.KEYDOWN):
-                        if i.key in globals.accept:
-                            self.pause = False
-                if self.choice_mode:
-                    heart = sprite.Sprite.get_sprite('spr_heart', 1)
-                    while 1:
-                        heart.rect.center = (132, 82) if self.choice == 0 else (325, 82)
-                        self.render()
-                        self.surface.blit(heart.image[0], heart.rect)
-                        self.run_wrapper()
-                        for i in pygame.event.get(pygame.KEYDOWN):
-                            if i.key in [globals.left, globals.right]:
-                                self.choice = 1 if self.choice is 0 else 0
-                            elif i.key in globals.accept:
-                                raise UserWarning
-            except IndexError:
-                return Typer.SKIPPED if will_skip else Typer.NOTSKIPPED
-            except UserWarning:
-                return Typer.CHOICE1 if self.choice == 0 else Typer.CHOICE2
+                    events = consumer.get()
+                    gameclock.clock.next_frame()
+                for i in events:
+                    if i is not None and i.type == pygame.KEYDOWN:
+                        self.on_key(i.key)
+        finally:
+            input.dispatcher.pop_focus(consumer)
+        return self.result
 
 
 class MetaTyper:
@@ -209,6 +264,27 @@ class MetaTyper:
         self.options = opts
         self.skipcount = 0
         self.choice = Typer.NOCHOICE
+        self.index = 0  # of the text being typed by tick
+        self.typer = None
+        self.finished = False
+
+    def make_typer(self, text: str) -> Typer:
+        typer = Typer()
+        typer.text = text
+        typer.on_run_loop = self.on_loop
+        typer.to_on_run_loop = self.on_loop_param
+        for i in self.options:
+            typer.__setattr__(i, self.options[i])
+        if typer.box_width is None and 'surface' in self.options:
+            typer.box_width = typer.surface.get_width()  # wrap to the box the text is typed into
+        return typer
+
+    def collect(self, res: int) -> None:
+        if res == Typer.SKIPPED:
+            self.skipcount += 1
+        elif res in [Typer.CHOICE1, Typer.CHOICE2]:
+            self.choice = res
+        self.clean_param(self.on_loop_param)
 
     def run(self) -> (int, int):
         """
@@ -216,20 +292,33 @@ class MetaTyper:
         :return: 2-tuple of int: how many skips occurred and what is the resulting choice.
         """
         for i in self.text:
-            typer = Typer()
-            typer.text = i
-            typer.on_run_loop = self.on_loop
-            typer.to_on_run_loop = self.on_loop_param
-            for i in self.options:
-                typer.__setattr__(i, self.options[i])
-            res = typer.run()
-            if res == Typer.SKIPPED:
-                self.skipcount += 1
-            elif res in [Typer.CHOICE1, typer.CHOICE2]:
-                self.choice = res
-            self.clean_param(self.on_loop_param)
+            self.collect(self.make_typer(i).run())
+        self.finished = True
         return self.skipcount, self.choice
 
+    def tick(self) -> bool:
+        """
+        Advance by one frame, from the main loop: the counterpart of run that doesn't block. Keys go to on_key.
+        :return: True once every text is finished; the outcome is then in skipcount and choice.
+        """
+        if self.finished:
+            return True
+        if self.typer is None:
+            if self.index >= len(self.text):
+                self.finished = True
+                return True
+            self.typer = self.make_typer(self.text[self.index])
+        if self.typer.tick():
+            self.collect(self.typer.result)
+            self.typer = None
+            self.index += 1
+            self.finished = self.index >= len(self.text)
+        return self.finished
+
+    def on_key(self, key: int) -> None:
+        if self.typer is not None:
+            self.typer.on_key(key)
+
 
 if __name__ == '__main__':
     s = pygame.display.set_mode((480, 200))
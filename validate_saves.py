@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Validate and summarize SAVE files in bulk.
+
+Every file named like --pattern under the given paths is parsed with savedata.parse in a pool of worker
+processes. Prints the field-level errors of every broken SAVE, then how plot, room, LV and the flags are
+distributed over the valid ones, then the throughput. Exits with 1 if any SAVE is broken.
+
+    python3 validate_saves.py [--pattern GLOB] [--jobs N] [--json] PATH ...
+"""
+
+import argparse
+import collections
+import fnmatch
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import savedata
+
+
+def find_saves(paths, pattern):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if fnmatch.fnmatch(name, pattern):
+                    yield os.path.join(root, name)
+
+
+def check(path):
+    """Parse one SAVE. Runs in a worker process, so return only what the summary needs."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return path, 0, [(0, 'file', str(e))], None
+    parsed = savedata.parse(text)
+    if parsed.errors:
+        return path, len(text), parsed.errors, None
+    values = parsed.values
+    flags = [i - savedata.FLAGS.start for i in savedata.FLAGS if values[i]]
+    if values[548] in savedata.DOGCHECK_ROOMS:
+        return path, len(text), [(548, 'room', '{} is a Dogcheck room'.format(values[548]))], None
+    return path, len(text), [], (values[savedata.PLOT], values[548], values[2], flags)
+
+
+class Summary:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.broken = {}  # path -> errors
+        self.error_fields = collections.Counter()
+        self.plots = collections.Counter()
+        self.rooms = collections.Counter()
+        self.lvs = collections.Counter()
+        self.flags = collections.Counter()  # flag number -> SAVEs where it is set
+
+    def add(self, result):
+        path, size, errors, info = result
+        self.files += 1
+        self.bytes += size
+        if errors:
+            self.broken[path] = errors
+            self.error_fields.update(set(i[1] for i in errors))
+            return
+        plot, room, lv, flags = info
+        self.plots[plot] += 1
+        self.rooms[room] += 1
+        self.lvs[lv] += 1
+        self.flags.update(flags)
+
+    def as_dict(self, elapsed):
+        return {'files': self.files, 'valid': self.files - len(self.broken), 'broken': len(self.broken),
+                'seconds': elapsed, 'files_per_second': self.files / max(elapsed, 1e-9),
+                'errors': {path: [list(i) for i in errors] for path, errors in self.broken.items()},
+                'error_fields': dict(self.error_fields), 'plot': dict(self.plots), 'room': dict(self.rooms),
+                'lv': dict(self.lvs), 'flags': dict(self.flags)}
+
+    def print(self, elapsed, top=20):
+        for path, errors in sorted(self.broken.items()):
+            print('{}:'.format(path))
+            for line, field, message in errors:
+                print('  line {} ({}): {}'.format(line, field, message))
+        valid = self.files - len(self.broken)
+        print('\n{} SAVEs, {} valid, {} broken'.format(self.files, valid, len(self.broken)))
+        if self.error_fields:
+            print('Broken fields: ' + ', '.join('{} {}'.format(k, v) for k, v in self.error_fields.most_common()))
+        for title, counter in [('plot', self.plots), ('room', self.rooms), ('LV', self.lvs)]:
+            if counter:
+                print('{}: '.format(title) + ', '.join(
+                    '{}: {}'.format(savedata.number(k), v) for k, v in sorted(counter.items())[:top]))
+        if self.flags:
+            print('Flags set most often: ' + ', '.join(
+                '{} ({:.0%})'.format(k, v / max(valid, 1)) for k, v in self.flags.most_common(top)))
+        print('Checked in {:.2f}s: {:.0f} SAVEs/s, {:.1f} MB/s'.format(
+            elapsed, self.files / max(elapsed, 1e-9), self.bytes / 1024 / 1024 / max(elapsed, 1e-9)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate and summarize SAVE files.')
+    parser.add_argument('paths', nargs='+', help='SAVE files, or directories to search for them')
+    parser.add_argument('--pattern', default='file0*', help='file names to look for (default %(default)s)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    summary = Summary()
+    started_at = time.time()
+    paths = find_saves(args.paths, args.pattern)
+    if args.jobs > 1:
+        with multiprocessing.Pool(args.jobs) as pool:
+            for result in pool.imap_unordered(check, paths, chunksize=64):
+                summary.add(result)
+    else:
+        for result in map(check, paths):
+            summary.add(result)
+    elapsed = time.time() - started_at
+    if args.json:
+        json.dump(summary.as_dict(elapsed), sys.stdout, indent=1, sort_keys=True)
+        print()
+    else:
+        summary.print(elapsed)
+    return 1 if summary.broken else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())